@@ -0,0 +1,165 @@
+from logging import Logger
+from threading import Lock
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl, urlencode, urlunparse
+from scraper.config.metadata import Article, Theme
+from scraper.utils import setup_logger
+
+import os
+import sqlite3
+
+
+_TRACKING_PARAMS = {'gclid', 'fbclid', 'mc_cid', 'mc_eid', 'ocid', 'cmpid', 'guccounter', 'guce_referrer', 'guce_referrer_sig', 'taid', 'ref', 'src'}
+
+
+def normalize_url(url: str) -> str:
+    """Return the canonical form of <url> used for recognizing the same
+    article under different URLs: https, lowercase host without "www.",
+    no fragment, no tracking parameters, sorted query parameters and no
+    trailing slash.
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.'):
+        host = host[len('www.'):]
+    params = sorted(
+        (name, value) for name, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if not name.lower().startswith('utm_') and name.lower() not in _TRACKING_PARAMS
+    )
+    path = parsed.path.rstrip('/') if parsed.path not in ('', '/') else ''
+    return urlunparse(('https', host, path, '', urlencode(params), ''))
+
+
+@dataclass
+class FreshnessPolicy:
+    """When an already fetched article should be fetched again. By default,
+    articles are never fetched again. <max_age> applies to every site except
+    those in <site_max_ages>.
+    """
+    max_age: Optional[timedelta] = None
+    site_max_ages: Dict[str, timedelta] = field(default_factory=dict)
+
+    def is_stale(self, site: Optional[str], last_fetched: datetime, now: datetime) -> bool:
+        max_age = self.site_max_ages.get(site, self.max_age)
+        return max_age is not None and now - last_fetched > max_age
+
+
+@dataclass
+class ArticleIndex:
+    """A SQLite index of the articles seen across runs. It keeps each
+    resolved URL with its canonical URL, when it was first seen and last
+    fetched, and which (theme, keyword) searches returned it. Articles
+    that were already fetched are skipped unless the freshness policy
+    says they are stale.
+    """
+    _logger: Logger
+    _lock: Lock
+    _connection: sqlite3.Connection
+    db_path: str = os.path.join('data', 'cache', 'article_index.sqlite')
+    policy: FreshnessPolicy = None
+
+    def __init__(self, db_path: str = None, policy: FreshnessPolicy = None) -> None:
+        self._logger = setup_logger(self.__class__.__name__)
+        self._lock = Lock()
+        self.policy = policy if policy is not None else FreshnessPolicy()
+        if db_path is not None:
+            self.db_path = db_path
+        if os.path.dirname(self.db_path) != '':
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS articles ('
+            'url TEXT PRIMARY KEY, '
+            'canonical_url TEXT NOT NULL, '
+            'site TEXT, '
+            'first_seen TEXT NOT NULL, '
+            'last_fetched TEXT);'
+            'CREATE INDEX IF NOT EXISTS articles_canonical_url ON articles (canonical_url);'
+            'CREATE TABLE IF NOT EXISTS associations ('
+            'canonical_url TEXT NOT NULL, '
+            'theme TEXT NOT NULL, '
+            'keyword TEXT NOT NULL, '
+            'first_seen TEXT NOT NULL, '
+            'PRIMARY KEY (canonical_url, theme, keyword));'
+        )
+        self._connection.commit()
+
+    def _now(self) -> datetime:
+        return datetime.now(timezone.utc)
+
+    def record_search(self, article_urls: List[str], theme: Theme, keyword: str) -> int:
+        """Record that searching <keyword> under <theme> returned <article_urls>.
+        Return the number of new (article, theme, keyword) associations.
+        """
+        now = self._now().isoformat()
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO articles (url, canonical_url, first_seen) VALUES (?, ?, ?)',
+                [(article_url, normalize_url(article_url), now) for article_url in article_urls]
+            )
+            changes_before = self._connection.total_changes
+            self._connection.executemany(
+                'INSERT OR IGNORE INTO associations (canonical_url, theme, keyword, first_seen) VALUES (?, ?, ?, ?)',
+                [(normalize_url(article_url), theme, keyword, now) for article_url in article_urls]
+            )
+            new_associations = self._connection.total_changes - changes_before
+            self._connection.commit()
+        return new_associations
+
+    def should_fetch(self, article_url: str) -> bool:
+        """Check if <article_url> (or another URL of the same canonical
+        article) has never been fetched, or was fetched too long ago.
+        """
+        with self._lock:
+            fetches = self._connection.execute(
+                'SELECT site, last_fetched FROM articles WHERE (url = ? OR canonical_url = ?) AND last_fetched IS NOT NULL',
+                (article_url, normalize_url(article_url))
+            ).fetchall()
+        now = self._now()
+        return all(self.policy.is_stale(site, datetime.fromisoformat(last_fetched), now) for site, last_fetched in fetches)
+
+    def filter_unfetched(self, article_urls: List[str]) -> List[str]:
+        """Return the URLs of <article_urls> that should be fetched.
+        """
+        unfetched_urls = [article_url for article_url in article_urls if self.should_fetch(article_url)]
+        self._logger.info(f'Skipping {len(article_urls) - len(unfetched_urls)} of {len(article_urls)} articles that were already fetched')
+        return unfetched_urls
+
+    def mark_fetched(self, article_url: str, article: Article) -> None:
+        """Record that <article_url> was fetched as <article>. If it resolved to
+        another URL, its searches are moved to the resolved canonical article.
+        """
+        now = self._now().isoformat()
+        canonical_url = normalize_url(article.url)
+        requested_canonical_url = normalize_url(article_url)
+        with self._lock:
+            for url in {article_url, article.url}:
+                self._connection.execute(
+                    'INSERT INTO articles (url, canonical_url, site, first_seen, last_fetched) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (url) DO UPDATE SET canonical_url = excluded.canonical_url, site = excluded.site, '
+                    'last_fetched = excluded.last_fetched',
+                    (url, canonical_url, article.site, now, now)
+                )
+            if requested_canonical_url != canonical_url:
+                self._connection.execute(
+                    'INSERT OR IGNORE INTO associations (canonical_url, theme, keyword, first_seen) '
+                    'SELECT ?, theme, keyword, first_seen FROM associations WHERE canonical_url = ?',
+                    (canonical_url, requested_canonical_url)
+                )
+                self._connection.execute('DELETE FROM associations WHERE canonical_url = ?', (requested_canonical_url,))
+            self._connection.commit()
+
+    def get_associations(self, article_url: str) -> List[Tuple[str, str]]:
+        """Return the (theme, keyword) searches that returned <article_url>.
+        """
+        with self._lock:
+            return self._connection.execute(
+                'SELECT theme, keyword FROM associations WHERE canonical_url = ? ORDER BY first_seen',
+                (normalize_url(article_url),)
+            ).fetchall()
+
+    def finish(self) -> None:
+        self._connection.close()
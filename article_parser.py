@@ -1,160 +1,405 @@
-from typing import List, Optional
-from functools import reduce
+from typing import Dict, Generator, Iterable, List, Optional, Set, Tuple, Union
+from itertools import chain
+from logging import WARNING
+from time import perf_counter
+from queue import Queue, Full
+from threading import Event, Thread
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from parsel import Selector
+from lxml import etree
 from scraper.utils import Logger, setup_logger 
+from scraper.metrics import Metrics, disable_metrics, enable_metrics, get_metrics
 from scraper.config.news_parser_config import NewsParserConfig
-from scraper.config.metadata import Row, Schema, SearchResult
+from scraper.config.instruction_plan import ColumnPlan, CompiledQuery, Container, build_document, build_pruned_document
+from scraper.config.metadata import ParseMode, Row, Schema, SearchResult, decompress_html
+from scraper.news.row_sink import ROW_SCHEMA, RowBatchEncoder, RowSink
+from scraper.news.selector_profiler import SelectorProfiler
+from scraper.news.generic_extractor import GenericExtractor
+from scraper.news.date_normalizer import DateNormalizer
+from scraper.news.duplicate_detector import DuplicateDetector
 
 import numpy as np
 import pandas as pd
+import pyarrow as pa
 
 
 @dataclass
 class ArticleParser:
     """
     """
-    search_results: List[SearchResult]
+    search_results: Iterable[SearchResult]
     _logger: Logger
+    profiler: Optional[SelectorProfiler] = None
+    parse_mode: str = ParseMode.FULL
+    extractor: Optional[GenericExtractor] = None
+    date_normalizer: Optional[DateNormalizer] = None
+    duplicate_detector: Optional[DuplicateDetector] = None
     config: NewsParserConfig = NewsParserConfig()
 
-    def __init__(self, search_results: List[SearchResult]) -> None:
+    def __init__(self, search_results: Iterable[SearchResult], profiler: Optional[SelectorProfiler] = None,
+                 parse_mode: str = ParseMode.FULL, extractor: Optional[GenericExtractor] = None,
+                 use_extractor: bool = True, date_normalizer: Optional[DateNormalizer] = None,
+                 duplicate_detector: Optional[DuplicateDetector] = None, adaptive: bool = False) -> None:
+        """<search_results> can be a list or a generator (e.g. the one
+        returned by GoogleNewsScraper.get_search_articles), which is
+        consumed as the articles are parsed.
+        With a <profiler>, the time, hits and returned nodes of every
+        query evaluation are recorded (see selector_report).
+        With <parse_mode> set to ParseMode.PRUNED, pages are parsed without
+        their scripts, styles and comments, and only up to the end of the
+        elements their site's queries are anchored to.
+        With <use_extractor>, articles from sites without instructions 
+        (including unknown 'TBD' sites) are extracted by <extractor> (the
+        default GenericExtractor if not given) instead of left empty.
+        Tabulated dates are normalized by <date_normalizer> (the default 
+        DateNormalizer if not given), which learns the date formats of each site.
+        With a <duplicate_detector>, the rows of near-duplicate articles (e.g.
+        syndicated press releases) are dropped or grouped as it is set to.
+        With <adaptive>, the fallbacks of each column are tried in order of
+        their successes once enough articles were parsed (see ColumnPlan),
+        on a parser config of its own. On parsing processes, each process
+        orders them by the articles it parsed.
+        """
         self.search_results = search_results
+        self.profiler = profiler
+        self.parse_mode = parse_mode
+        self.extractor = (extractor if extractor is not None else GenericExtractor()) if use_extractor else None
+        self.date_normalizer = date_normalizer if date_normalizer is not None else DateNormalizer()
+        self.duplicate_detector = duplicate_detector
+        if adaptive:
+            self.config = NewsParserConfig(adaptive)
         self._logger = setup_logger(self.__class__.__name__)
 
-    def _piecewise_parse(self, query: str, selector: Selector) -> List[str]:
+    def _piecewise_parse(self, query: CompiledQuery, document: etree._Element, site: str = None, column: str = None) -> List[str]:
         """
         """
-        if '/' in query and 'text()' in query:
-            return selector.xpath(query).getall()
-        elif '/' in query:
-            return selector.xpath(query).css('*::text').getall()
-        elif '::text' in query:
-            return selector.css(query).getall()
-        else:
-            return selector.css(f'{query} *::text').getall()
+        if self.profiler is None:
+            return query.evaluate(document)
+
+        start = perf_counter()
+        values = query.evaluate(document)
+        self.profiler.record(site, column, query.query, perf_counter() - start, len(values))
+        return values
         
-    def _parse(self, queries: List[str], selector: Selector) -> List[str]: 
+    def _parse(self, queries: List[CompiledQuery], document: etree._Element, site: str = None, column: str = None) -> List[str]: 
         """
         """
-        piecewise_values = [self._piecewise_parse(query, selector) for query in queries]
-        return reduce(lambda x, y: x + y, piecewise_values)
+        piecewise_values = (self._piecewise_parse(query, document, site, column) for query in queries)
+        return list(chain.from_iterable(piecewise_values))
     
-    def _try_value(self, possible_query: str, selector: Selector) -> Optional[str]:
+    def _try_value(self, possible_query: CompiledQuery, document: etree._Element, site: str = None, column: str = None) -> Optional[str]:
         """
         """
-        column_value = self._piecewise_parse(possible_query, selector)
+        column_value = self._piecewise_parse(possible_query, document, site, column)
         return column_value[0].strip() if column_value != [] else None
 
     
-    def _try_join_values(self, queries: List[str], selector: Selector) -> Optional[str]:
+    def _try_join_values(self, queries: List[CompiledQuery], document: etree._Element, site: str = None, column: str = None) -> Optional[str]:
         """
         """
-        column_values = self._parse(queries, selector)
+        column_values = self._parse(queries, document, site, column)
         return '\n'.join([text.strip() for text in column_values]).strip() if column_values != [] else None
         
 
-    def get_value(self, column: str, possible_queries: List[str], selector: Selector, site: str) -> Optional[str]:
-        """
+    def get_value(self, column_plan: ColumnPlan, document: etree._Element, site: str) -> Optional[str]:
+        """Return the value of the first fallback query that parses
+        anything. The remaining fallbacks aren't evaluated, unless
+        an exhaustive profiler profiles them.
         """
-        possible_values = map(lambda possible_query: self._try_value(possible_query, selector), possible_queries)
-        not_null_values = list(filter(lambda possible_value: possible_value is not None, possible_values))
+        fallbacks = column_plan.fallbacks()
+        for position, possible_query in fallbacks:
+            possible_value = self._try_value(possible_query, document, site, column_plan.column)
+            column_plan.record(position, possible_value is not None)
+            if possible_value is not None:
+                self._logger.info(f'Successfully parsed the article\'s {column_plan.column} info')
+                if self.profiler is not None and self.profiler.exhaustive:
+                    for _, remaining_query in fallbacks:
+                        self._try_value(remaining_query, document, site, column_plan.column)
+                return possible_value.strip()
 
-        if not_null_values != []:
-            self._logger.info(f'Successfully parsed the article\'s {column} info')
-            return not_null_values[0].strip()  
-        else:
-            self._logger.error(f'No info parsed for article\'s {column}. Either no info present or need to add a new instruction under "{site}"')
-            return None
+        self._logger.error(f'No info parsed for article\'s {column_plan.column}. Either no info present or need to add a new instruction under "{site}"')
+        return None
         
     
-    def get_join_values(self, column: str, possible_queries_list: List[List[str]], selector: Selector, site: str) -> Optional[str]:
+    def get_join_values(self, column_plan: ColumnPlan, document: etree._Element, site: str) -> Optional[str]:
+        """Return the joined values of the first fallback group of
+        queries that parses anything. The remaining groups aren't evaluated,
+        unless an exhaustive profiler profiles them.
         """
+        fallbacks = column_plan.fallbacks()
+        for position, possible_queries in fallbacks:
+            possible_value = self._try_join_values(possible_queries, document, site, column_plan.column)
+            column_plan.record(position, possible_value is not None)
+            if possible_value is not None:
+                self._logger.info(f'Successfully parsed the article\'s {column_plan.column} info')
+                if self.profiler is not None and self.profiler.exhaustive:
+                    for _, remaining_queries in fallbacks:
+                        self._try_join_values(remaining_queries, document, site, column_plan.column)
+                return possible_value.strip()
+
+        self._logger.error(f'No info parsed for article\'s {column_plan.column}. Either no info present or need to add a new instruction under "{site}"')
+        return None
+
+
+    def fallback_stats(self) -> pd.DataFrame:
+        """Return how often each fallback query of each site and column
+        has been tried and has succeeded. Fallbacks that are tried but 
+        never succeed are dead weight in the instructions.
         """
-        possible_values = map(lambda possible_queries: self._try_join_values(possible_queries, selector), possible_queries_list)
-        not_null_values = list(filter(lambda possible_value: possible_value is not None, possible_values))
+        stats = [
+            {
+                'site': site,
+                'column': column,
+                'position': position,
+                'query': ' | '.join(query.query for query in queries) if column_plan.joined else queries.query,
+                'attempts': column_plan.attempts[position],
+                'hits': column_plan.hits[position]
+            }
+            for site, plan in self.config.plans.items()
+            for column, column_plan in plan.columns.items()
+            for position, queries in enumerate(column_plan.queries)
+        ]
+        stats_df = pd.DataFrame(stats, columns=['site', 'column', 'position', 'query', 'attempts', 'hits'])
+        stats_df['hit_rate'] = (stats_df['hits'] / stats_df['attempts'].where(stats_df['attempts'] > 0)).astype('float')
+        return stats_df
 
-        if not_null_values != []:
-            self._logger.info(f'Successfully parsed the article\'s {column} info')
-            return not_null_values[0].strip()  
-        else:
-            self._logger.error(f'No info parsed for article\'s {column}. Either no info present or need to add a new instruction under "{site}"')
-            return None
+
+    def selector_report(self) -> pd.DataFrame:
+        """Return the queries evaluated so far ranked by their total time,
+        with their hits, misses and returned nodes. Needs a profiler.
+        """
+        if self.profiler is None:
+            raise AttributeError('No profiler was given to the ArticleParser')
+        return self.profiler.report()
 
 
-    def parse_articles(self) -> List[Row]:
+    def _build_document(self, html_content: Union[str, bytes], site: str, containers: Optional[List[Container]] = None) -> etree._Element:
+        with get_metrics().time('document_build_seconds'):
+            if self.parse_mode != ParseMode.PRUNED:
+                return build_document(html_content)
+            document, truncated = build_pruned_document(html_content, containers)
+            get_metrics().increment('pruned_documents_total', site=site, truncated=str(truncated).lower())
+            return document
+
+
+    def _extract_article(self, site: str, url: str, html_content: Union[str, bytes]) -> Dict[str, Optional[str]]:
+        """Extract the values of each schema column from the HTML content
+        <html_content> of the article at <url> from the news site <site>,
+        which has no parsing instructions.
         """
+        self._logger.info(f'No instructions for "{site}", extracting the article generically -> {url}')
+        try:
+            document = self._build_document(html_content, site)
+            with get_metrics().time('generic_extraction_seconds'):
+                column_values = self.extractor.extract(document)
+        except Exception as error:  # A malformed page shouldn't stop the other articles
+            self._logger.error(f'Unable to extract the article! {error.__class__.__name__}: {error} -> "{site}": {url}')
+            get_metrics().increment('articles_extracted_total', site=site, outcome='failed')
+            return {schema_col: None for schema_col in Schema().get_columns()}
+        get_metrics().increment('articles_extracted_total', site=site, outcome='extracted')
+        self._logger.info(f'Finish extracting the article -> "{site}": {url} \n')
+        return column_values
+
+
+    def _parse_article(self, site: str, url: str, html_content: Union[str, bytes]) -> Dict[str, Optional[str]]:
+        """Parse the values of each schema column from the HTML content
+        <html_content> (or its UTF-8 bytes) of the article at <url> from 
+        the news site <site>.
         """
+        column_values = {schema_col: None for schema_col in Schema().get_columns()}
 
-        rows = []
-        for search_result in self.search_results:
+        self._logger.info(f'Begin parsing the article -> "{site}": {url}')
+        if self.extractor is not None and not self.config.has_instructions(site):
+            return self._extract_article(site, url, html_content)
+        try:
+            self._logger.info(f'Checking if there\'s instructions available for parsing articles from "{site}"')
+            plan = self.config.get_plan(site)
+            self._logger.info(f'Instruction available for "{site}"')
 
-            column_values = {
-                'site': search_result.article.site,
-                'url': search_result.article.url,
-                'theme': search_result.theme,
-                'keyword': search_result.keyword
-            }
+            self._logger.info(f'Checking if the instruction for parsing articles from "{site}" is in scope')
+            if not self.config.instructions_in_scope(site):
+                self._logger.error(f'Instructions out of scope! Need to update the parser config for "{site}"')
+                raise AttributeError
+            self._logger.info(f'Instruction in scope for "{site}"')
 
-            self._logger.info(f'Begin parsing the article -> "{search_result.article.site}": {search_result.article.url}')
-            try:
-                self._logger.info(f'Checking if there\'s instructions available for parsing articles from "{search_result.article.site}"')
-                instructions = self.config.get_instructions(search_result.article.site)
-                self._logger.info(f'Instruction available for "{search_result.article.site}"')
-
-                self._logger.info(f'Checking if the instruction for parsing articles from "{search_result.article.site}" is in scope')
-                if not self.config.instructions_in_scope(search_result.article.site):
-                    self._logger.error(f'Instructions out of scope! Need to update the parser config for "{search_result.article.site}"')
-                    raise AttributeError
-                self._logger.info(f'Instruction in scope for "{search_result.article.site}"')
-
-                if Schema.TITLE not in instructions:
-                    column_values[Schema.TITLE] = None
-                if Schema.DATE not in instructions:
-                    column_values[Schema.DATE] = None 
-                if Schema.AUTHOR not in instructions:
-                    column_values[Schema.AUTHOR] = None 
-                if Schema.CONTENT not in instructions:
-                    column_values[Schema.CONTENT] = None
-
-                selector = Selector(text=search_result.article.html_content)
-
-                for column, possible_queries in instructions.items():
-                    if isinstance(possible_queries[0], str):
-                        syntax = list(set(map(lambda q: 'XPATH' if '/' in q else 'CSS', possible_queries)))
-                        self._logger.info(f'Parsing the article\'s {column} using {syntax[0] if len(syntax) == 1 else 'CSS and XPATH'}')
-                        column_values[column] = self.get_value(column, possible_queries, selector, search_result.article.site)
+            metrics = get_metrics()
+            document = self._build_document(html_content, site, plan.containers)
+
+            for column, column_plan in plan.columns.items():
+                with metrics.time('column_parse_seconds', site=site, column=column):
+                    if not column_plan.joined:
+                        self._logger.info(f'Parsing the article\'s {column} using {column_plan.syntax}')
+                        column_values[column] = self.get_value(column_plan, document, site)
                     else:
-                        # syntax = list(set(map(lambda queries: , possible_queries)))
-                        column_values[column] = self.get_join_values(column, possible_queries, selector, search_result.article.site)  
-
-                # for column, query in instructions.items():
-                #     if isinstance(query, str):
-                #         self._logger.info(f'Parsing the article\'s {column} using {'XPATH' if '/' in query else 'CSS'}')    
-                #         column_values[column] = self.get_value(column, query, selector, search_result.article.site)
-                #     else:
-                #         sytax = list(set(map(lambda q: 'XPATH' if '/' in q else 'CSS', query)))
-                #         self._logger.info(f'Parsing the article\'s {column} using {sytax[0] if len(sytax) == 1 else 'CSS and XPATH'}')
-                #         column_values[column] = self.get_join_values(column, query, selector, search_result.article.site)
-
-                self._logger.info(f'Finish parsing the article -> "{search_result.article.site}": {search_result.article.url} \n')
-                rows.append(Row(**column_values))
-
-            except KeyError or AttributeError:  # Cannot find the news site in parser config
-                
-                self._logger.error(f'Unable to parse the article! Need to update either the site config or parsing instruction -> "{search_result.article.site}": {search_result.article.url} ')
-                for schema_col in Schema().get_columns():
-                    column_values[schema_col] = None
-
-                rows.append(Row(**column_values))
-
-        return rows
+                        column_values[column] = self.get_join_values(column_plan, document, site)  
+            metrics.increment('articles_parsed_total', site=site)
+
+            # for column, query in instructions.items():
+            #     if isinstance(query, str):
+            #         self._logger.info(f'Parsing the article\'s {column} using {'XPATH' if '/' in query else 'CSS'}')    
+            #         column_values[column] = self.get_value(column, query, selector, search_result.article.site)
+            #     else:
+            #         sytax = list(set(map(lambda q: 'XPATH' if '/' in q else 'CSS', query)))
+            #         self._logger.info(f'Parsing the article\'s {column} using {sytax[0] if len(sytax) == 1 else 'CSS and XPATH'}')
+            #         column_values[column] = self.get_join_values(column, query, selector, search_result.article.site)
+
+            self._logger.info(f'Finish parsing the article -> "{site}": {url} \n')
+
+        except (KeyError, AttributeError):  # Cannot find the news site in parser config
+            
+            self._logger.error(f'Unable to parse the article! Need to update either the site config or parsing instruction -> "{site}": {url} ')
+            column_values = {schema_col: None for schema_col in Schema().get_columns()}
+
+        return column_values
+
+
+    def _snapshot_fallback_stats(self, sites: Set[str]) -> Dict[Tuple[str, str], Tuple[List[int], List[int]]]:
+        """Return a copy of the fallback attempts and hits of every column of <sites>.
+        """
+        return {
+            (site, column): (list(column_plan.attempts), list(column_plan.hits))
+            for site in sites if site in self.config.plans
+            for column, column_plan in self.config.get_plan(site).columns.items()
+        }
+
+
+    def _merge_fallback_stats(self, stats_delta: Dict[Tuple[str, str], Tuple[List[int], List[int]]]) -> None:
+        """Add the fallback attempts and hits counted by a parsing worker.
+        """
+        for (site, column), (attempts, hits) in stats_delta.items():
+            column_plan = self.config.get_plan(site).columns[column]
+            column_plan.attempts = [total + delta for total, delta in zip(column_plan.attempts, attempts)]
+            column_plan.hits = [total + delta for total, delta in zip(column_plan.hits, hits)]
+
+
+    def _parse_chunks(self, search_results: List[SearchResult], workers: int, chunk_bytes: int) -> List[Tuple[Optional[str], ...]]:
+        """Parse the articles on a pool of <workers> processes. Only the site, URL 
+        and compressed HTML content of each article are sent, batched into chunks
+        of about <chunk_bytes> compressed bytes, and the column values come back
+        in input order.
+        """
+        chunks, chunk, chunk_size = [], [], 0
+        for search_result in search_results:
+            article = search_result.article
+            compressed_html = article.compressed_html
+            chunk.append((article.site, article.url, compressed_html))
+            chunk_size += len(compressed_html)
+            if chunk_size >= chunk_bytes:
+                chunks.append(chunk)
+                chunk, chunk_size = [], 0
+        if chunk != []:
+            chunks.append(chunk)
+
+        self._logger.info(f'Parsing {len(search_results)} articles in {len(chunks)} chunks on {workers} processes')
+        compact_rows = []
+        metrics = get_metrics()
+        initargs = (
+            self.profiler is not None, self.profiler is not None and self.profiler.exhaustive, self.parse_mode, self.extractor,
+            metrics.buckets if metrics.enabled else None, self.config.adaptive
+        )
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_parsing_worker, initargs=initargs) as executor:
+            for chunk_rows, stats_delta, profiles, metrics_delta in executor.map(_parse_chunk, chunks):
+                compact_rows.extend(chunk_rows)
+                self._merge_fallback_stats(stats_delta)
+                if self.profiler is not None:
+                    self.profiler.merge(profiles)
+                if metrics_delta is not None:
+                    metrics.merge(*metrics_delta)
+        return compact_rows
+
+
+    def _to_row(self, search_result: SearchResult, column_values: Dict[str, Optional[str]]) -> Row:
+        article = search_result.article
+        return Row(article.site, article.url, search_result.theme, search_result.keyword, **column_values, fetched_at=article.fetched_at)
+
+
+    def stream_articles(self, queue_size: int = 8) -> Generator[Row, None, None]:
+        """Yield a row for each article as soon as it is parsed. The search 
+        results are consumed on a background thread into a queue of at most
+        <queue_size> articles, so fetching and parsing overlap while only a
+        bounded number of articles is held in memory.
+        """
+        if self.duplicate_detector is not None:
+            yield from self.duplicate_detector.filter(self._stream_rows(queue_size))
+        else:
+            yield from self._stream_rows(queue_size)
+
+    def _stream_rows(self, queue_size: int) -> Generator[Row, None, None]:
+        search_queue = Queue(maxsize=queue_size)
+        stopped = Event()
+        end_of_results = object()
+
+        def put(item) -> bool:
+            while not stopped.is_set():
+                try:
+                    search_queue.put(item, timeout=0.5)
+                    return True
+                except Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            try:
+                for search_result in self.search_results:
+                    if not put(search_result):
+                        return
+            except Exception as error:
+                put(error)
+            put(end_of_results)
+
+        producer = Thread(target=produce, name=f'{self.__class__.__name__}-producer', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = search_queue.get()
+                if item is end_of_results:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                column_values = self._parse_article(item.article.site, item.article.url, item.article.html_bytes)
+                yield self._to_row(item, column_values)
+        finally:
+            stopped.set()
+
+
+    def parse_articles(self, workers: int = 1, chunk_bytes: int = 200_000) -> List[Row]:
+        """Parse the articles into rows of the output schema. With <workers> 
+        greater than 1, the HTML is parsed on a pool of that many processes.
+        """
+        if workers <= 1:
+            return list(self.stream_articles())
+
+        columns = Schema().get_columns()
+        search_results = list(self.search_results)
+        article_rows = [
+            self._to_row(search_result, dict(zip(columns, compact_row)))
+            for search_result, compact_row in zip(search_results, self._parse_chunks(search_results, workers, chunk_bytes))
+        ]
+        return list(self.duplicate_detector.filter(article_rows)) if self.duplicate_detector is not None else article_rows
     
-    def tabulate_articles(self) -> pd.DataFrame:
+    def write_articles(self, sink: RowSink) -> None:
+        """Stream the parsed rows into the output file <sink> (e.g. a 
+        ParquetRowSink) without keeping all of them in memory. Their dates
+        are normalized by this parser's date normalizer.
         """
+        sink.set_date_normalizer(self.date_normalizer)
+        with sink:
+            sink.write(self.stream_articles())
+
+
+    def tabulate_articles(self, arrow: bool = False, batch_size: int = 1000) -> pd.DataFrame:
+        """Return the parsed rows as a table. With <arrow>, the table is
+        built from Arrow record batches of <batch_size> rows and returned
+        with Arrow-backed columns (site, theme and keyword dictionary-encoded).
+        Besides the raw date, the table has the fetched_at and normalized
+        published_at times of each article (in UTC).
         """
+        if arrow:
+            batches = RowBatchEncoder(self.date_normalizer).encode_stream(self.stream_articles(), batch_size)
+            return pa.Table.from_batches(batches, schema=ROW_SCHEMA).to_pandas(types_mapper=pd.ArrowDtype)
+
         article_rows = self.parse_articles()
-        return pd.DataFrame({
+        articles_df = pd.DataFrame({
             'site': [row.site for row in article_rows],
             'url': [row.url for row in article_rows],
             'theme': [row.theme for row in article_rows],
@@ -162,7 +407,9 @@ class ArticleParser:
             'title': [row.title if row.title is not None else np.nan for row in article_rows],
             'date': [row.date if row.date is not None else np.nan for row in article_rows],
             'author': [row.author if row.author is not None else np.nan for row in article_rows],
-            'content': [row.content if row.content is not None else np.nan for row in article_rows]
+            'content': [row.content if row.content is not None else np.nan for row in article_rows],
+            'fetched_at': pd.to_datetime(pd.Series([row.fetched_at for row in article_rows], dtype='float64'), unit='s', utc=True),
+            'duplicate_of': [row.duplicate_of if row.duplicate_of is not None else np.nan for row in article_rows]
         }).astype({
             'site': 'string',
             'url': 'string',
@@ -171,5 +418,53 @@ class ArticleParser:
             'title': 'string',
             'date': 'string',
             'author': 'string',
-            'content': 'string'
+            'content': 'string',
+            'fetched_at': 'datetime64[ns, UTC]',
+            'duplicate_of': 'string'
         })
+        articles_df['published_at'] = self.date_normalizer.normalize_table(articles_df)
+        return articles_df
+
+
+_worker_parser: Optional[ArticleParser] = None
+
+
+def _init_parsing_worker(profile: bool = False, exhaustive: bool = False, parse_mode: str = ParseMode.FULL,
+                         extractor: Optional[GenericExtractor] = None, metric_buckets: Optional[Dict[str, List[float]]] = None,
+                         adaptive: bool = False) -> None:
+    """Create the article parser (and its compiled instructions)
+    once per parsing process, with a profiler if <profile>, reordering
+    its fallbacks if <adaptive>. Metrics are
+    recorded (with <metric_buckets>) if they are given, starting from none
+    even if the process was forked from one that recorded some.
+    """
+    global _worker_parser
+    if metric_buckets is not None:
+        enable_metrics(Metrics(buckets=metric_buckets))
+    else:
+        disable_metrics()
+    _worker_parser = ArticleParser([], SelectorProfiler(exhaustive) if profile else None, parse_mode, extractor, extractor is not None,
+                                   adaptive=adaptive)
+    _worker_parser._logger.setLevel(WARNING)
+
+
+def _parse_chunk(chunk: List[Tuple[str, str, bytes]]) -> Tuple[List[Tuple[Optional[str], ...]], Dict, Dict, Optional[Tuple]]:
+    """Parse a chunk of (site, URL, compressed HTML content) articles in a parsing process.
+    Return the column values of each article, and the fallback stats, 
+    query profiles and metrics (None unless enabled) recorded for them.
+    """
+    sites = {site for site, _, _ in chunk}
+    stats_before = _worker_parser._snapshot_fallback_stats(sites)
+    compact_rows = [
+        tuple(_worker_parser._parse_article(site, url, decompress_html(compressed_html)).values())
+        for site, url, compressed_html in chunk
+    ]
+    stats_after = _worker_parser._snapshot_fallback_stats(sites)
+    stats_delta = {
+        key: ([after - before for after, before in zip(attempts, stats_before[key][0])],
+              [after - before for after, before in zip(hits, stats_before[key][1])])
+        for key, (attempts, hits) in stats_after.items()
+    }
+    profiles = _worker_parser.profiler.take() if _worker_parser.profiler is not None else {}
+    metrics_delta = get_metrics().take() if get_metrics().enabled else None
+    return compact_rows, stats_delta, profiles, metrics_delta
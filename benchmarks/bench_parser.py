@@ -0,0 +1,299 @@
+"""Offline benchmark of ArticleParser.parse_articles over the recorded
+HTML corpus in benchmarks/corpus/<version>, without any browser.
+
+    python benchmarks/bench_parser.py                    # compare against benchmarks/baseline.json
+    python benchmarks/bench_parser.py --update-baseline  # record a new baseline
+    python benchmarks/bench_parser.py --workers 4 --repeat 100 --output results.json
+    python benchmarks/bench_parser.py --parse-mode pruned
+
+The corpus files are never edited in place: a changed corpus is a new
+version directory, so results are only compared on the same corpus.
+The exit code is 1 if the parsed values changed or a metric regressed
+by more than the tolerance (a fraction of the baseline's value).
+
+Timings are compared relative to parsing the same pages with lxml alone,
+timed alongside them, so that the machine running slower or faster than
+when the baseline was recorded doesn't count. Their 10th percentile is
+compared, which neither a lucky pass nor a slow spell sets. They are only
+compared against a baseline recorded with the same Python and lxml
+versions and machine type. Results of another parse mode than the
+baseline's are compared as well, e.g. to see what pruning gains.
+"""
+from typing import Dict, List, Optional, Tuple
+from scraper.config.metadata import Article, ParseMode, SearchResult, Theme
+from scraper.news.article_parser import ArticleParser
+from lxml import etree, html
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+import gc
+import platform
+import statistics
+import tracemalloc
+
+try:
+    import resource
+    RESOURCE_AVAILABLE = True
+except ImportError:  # Not available on Windows
+    RESOURCE_AVAILABLE = False
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+CORPUS_VERSION = 'v1'
+HIGHER_IS_BETTER = {'docs_per_sec', 'mb_per_sec', 'relative_speed'}
+ENVIRONMENT_KEYS = ('python', 'lxml', 'machine')
+REFERENCE_PARSER = html.HTMLParser(recover=True, encoding='utf-8', huge_tree=True)
+
+
+def load_corpus(version: str = CORPUS_VERSION) -> Tuple[List[Dict], List[SearchResult]]:
+    """Return the manifest entries and search results of the corpus <version>,
+    after checking that no file differs from its recorded checksum.
+    """
+    corpus_dir = os.path.join(BENCHMARKS_DIR, 'corpus', version)
+    with open(os.path.join(corpus_dir, 'manifest.json')) as manifest_file:
+        manifest = json.load(manifest_file)
+
+    search_results = []
+    for entry in manifest['articles']:
+        with open(os.path.join(corpus_dir, entry['file']), 'rb') as html_file:
+            content = html_file.read()
+        if hashlib.sha256(content).hexdigest() != entry['sha256']:
+            raise ValueError(f'{entry["file"]} differs from corpus {version}. Record a changed corpus as a new version')
+        search_results.append(SearchResult('benchmark', Theme.DEMAND, Article(entry['site'], entry['url'], content.decode('utf-8'))))
+    return manifest['articles'], search_results
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def _time_reference(html_bytes: bytes) -> float:
+    """Return the seconds lxml alone takes to parse <html_bytes>, which
+    timings are compared relative to.
+    """
+    start = time.perf_counter()
+    etree.fromstring(html_bytes, parser=REFERENCE_PARSER)
+    return time.perf_counter() - start
+
+
+def _content_hash(content: Optional[str]) -> Optional[str]:
+    return hashlib.sha256(content.encode('utf-8')).hexdigest() if content is not None else None
+
+
+def check_expected(entries: List[Dict], search_results: List[SearchResult], parse_mode: str = ParseMode.FULL) -> List[str]:
+    """Return the differences between the values parsed from the corpus
+    and the values expected in its manifest.
+    """
+    rows = ArticleParser(search_results, parse_mode=parse_mode).parse_articles()
+    differences = []
+    for entry, row in zip(entries, rows):
+        parsed = {'title': row.title, 'date': row.date, 'author': row.author, 'content_sha256': _content_hash(row.content)}
+        for column, expected in entry['expected'].items():
+            if parsed[column] != expected:
+                differences.append(f'{entry["site"]} {column}: expected {expected!r}, parsed {parsed[column]!r}')
+    return differences
+
+
+def measure_throughput(search_results: List[SearchResult], repeat: int, workers: int, parse_mode: str = ParseMode.FULL,
+                       copies: int = 10) -> Dict[str, float]:
+    """Return the median docs/sec and MB/sec of <repeat> passes, each parsing
+    <copies> copies of the corpus (after one warm-up pass), and their speed
+    relative to lxml alone parsing the same pages after each pass (1.0 is
+    as fast), by the 10th percentile of both times.
+    """
+    pass_results = search_results * copies
+    pages = [search_result.article.html_bytes for search_result in search_results]
+    pass_mb = copies * sum(len(page) for page in pages) / 1e6
+    ArticleParser(search_results, parse_mode=parse_mode).parse_articles(workers=workers)
+
+    pass_seconds, reference_seconds = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ArticleParser(pass_results, parse_mode=parse_mode).parse_articles(workers=workers)
+        pass_seconds.append(time.perf_counter() - start)
+        reference_seconds.append(copies * sum(_time_reference(page) for page in pages))
+    median_seconds = statistics.median(pass_seconds)
+    return {
+        'docs_per_sec': len(pass_results) / median_seconds,
+        'mb_per_sec': pass_mb / median_seconds,
+        'relative_speed': _percentile(reference_seconds, 0.1) / _percentile(pass_seconds, 0.1)
+    }
+
+
+def measure_peak_memory(search_results: List[SearchResult], parse_mode: str = ParseMode.FULL) -> Dict[str, float]:
+    """Return the peak Python heap traced while parsing the corpus once, and
+    the peak resident memory of the process (which includes lxml's trees).
+    """
+    tracemalloc.start()
+    ArticleParser(search_results, parse_mode=parse_mode).parse_articles()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    memory = {'peak_traced_mb': peak / 1e6}
+    if RESOURCE_AVAILABLE:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        memory['max_rss_mb'] = max_rss / 1e6 if sys.platform == 'darwin' else max_rss / 1e3  # Bytes on macOS, KB elsewhere
+    return memory
+
+
+def measure_site_latency(search_results: List[SearchResult], repeat: int, parse_mode: str = ParseMode.FULL) -> Dict[str, Dict[str, float]]:
+    """Return the median and 95th percentile milliseconds of parsing each
+    site's article, and how many times longer than lxml alone parsing it
+    (timed right after) that takes, by the 10th percentile of both times.
+    The sites take turns, so that a slow spell of the machine is spread
+    over all of them instead of one site's runs.
+    """
+    parser = ArticleParser([], parse_mode=parse_mode)
+    pages = [(search_result.article, search_result.article.html_bytes) for search_result in search_results]
+    site_milliseconds = {article.site: [] for article, _ in pages}
+    reference_milliseconds = {article.site: [] for article, _ in pages}
+    for article, page in pages:
+        parser._parse_article(article.site, article.url, page)
+    for _ in range(repeat):
+        for article, page in pages:
+            start = time.perf_counter()
+            parser._parse_article(article.site, article.url, page)
+            site_milliseconds[article.site].append((time.perf_counter() - start) * 1000)
+            reference_milliseconds[article.site].append(_time_reference(page) * 1000)
+
+    return {
+        site: {
+            'median_ms': statistics.median(milliseconds),
+            'p95_ms': _percentile(milliseconds, 0.95),
+            'relative_p10': _percentile(milliseconds, 0.1) / _percentile(reference_milliseconds[site], 0.1)
+        }
+        for site, milliseconds in site_milliseconds.items()
+    }
+
+
+def run_benchmark(version: str = CORPUS_VERSION, repeat: int = 100, workers: int = 1, parse_mode: str = ParseMode.FULL) -> Dict:
+    entries, search_results = load_corpus(version)
+    gc.collect()
+    gc.disable()  # Keep collections of earlier passes out of the timings
+    try:
+        return {
+            'corpus': version,
+            'articles': len(search_results),
+            'workers': workers,
+            'parse_mode': parse_mode,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'lxml': etree.__version__,
+            'machine': platform.machine(),
+            'differences': check_expected(entries, search_results, parse_mode),
+            'throughput': measure_throughput(search_results, repeat, workers, parse_mode),
+            'memory': measure_peak_memory(search_results, parse_mode),
+            'site_latency': measure_site_latency(search_results, repeat, parse_mode)
+        }
+    finally:
+        gc.enable()
+
+
+def _flatten(results: Dict) -> Dict[str, float]:
+    """Return the compared metrics of <results> keyed by their path (e.g. "site_latency/CME Group/relative_p10").
+    """
+    metrics = {'throughput/relative_speed': results['throughput']['relative_speed'],
+               'memory/peak_traced_mb': results['memory']['peak_traced_mb']}
+    for site, latency in results['site_latency'].items():
+        metrics[f'site_latency/{site}/relative_p10'] = latency['relative_p10']
+    return metrics
+
+
+def get_environment_differences(results: Dict, baseline: Dict) -> List[str]:
+    """Return how the Python and lxml versions and machine type of <results>
+    differ from those <baseline> was recorded with, whose timings don't compare.
+    """
+    return [
+        f'{key} {results.get(key)} instead of {baseline.get(key)}'
+        for key in ENVIRONMENT_KEYS if results.get(key) != baseline.get(key)
+    ]
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return the metrics of <results> that regressed by more than
+    <tolerance> (a fraction) compared to <baseline>, or none if <baseline>
+    was recorded in another environment (see get_environment_differences).
+    """
+    if results['corpus'] != baseline['corpus']:
+        return [f'The baseline was recorded on corpus {baseline["corpus"]}, not {results["corpus"]}']
+    if get_environment_differences(results, baseline) != []:
+        return []
+
+    regressions = []
+    baseline_metrics = _flatten(baseline)
+    for path, value in _flatten(results).items():
+        if path not in baseline_metrics:
+            continue
+        expected = baseline_metrics[path]
+        if path.rsplit('/', 1)[-1] in HIGHER_IS_BETTER:
+            regressed = value < expected * (1 - tolerance)
+        else:
+            regressed = value > expected * (1 + tolerance)
+        if regressed:
+            regressions.append(f'{path}: {value:.3f} vs baseline {expected:.3f}')
+    return regressions
+
+
+def _print_results(results: Dict) -> None:
+    throughput, memory = results['throughput'], results['memory']
+    print(f'Corpus {results["corpus"]}: {results["articles"]} articles, {results["workers"]} worker(s), '
+          f'{results.get("parse_mode", ParseMode.FULL)} parse mode, {results["repeat"]} passes')
+    print(f'Throughput: {throughput["docs_per_sec"]:.1f} docs/sec, {throughput["mb_per_sec"]:.2f} MB/sec '
+          f'({throughput["relative_speed"]:.2f}x the speed of lxml alone)')
+    print(f'Peak memory: {memory["peak_traced_mb"]:.1f} MB traced' + (f', {memory["max_rss_mb"]:.1f} MB max RSS' if 'max_rss_mb' in memory else ''))
+    for site, latency in results['site_latency'].items():
+        print(f'  {site:<48} median {latency["median_ms"]:7.2f} ms   p95 {latency["p95_ms"]:7.2f} ms   '
+              f'{latency["relative_p10"]:5.2f}x lxml alone')
+
+
+def main() -> int:
+    argument_parser = argparse.ArgumentParser(description='Benchmark ArticleParser over the recorded HTML corpus.')
+    argument_parser.add_argument('--corpus', default=CORPUS_VERSION, help='corpus version under benchmarks/corpus')
+    argument_parser.add_argument('--repeat', type=int, default=100, help='parsing passes per measurement')
+    argument_parser.add_argument('--workers', type=int, default=1, help='parsing processes of parse_articles')
+    argument_parser.add_argument('--parse-mode', default=ParseMode.FULL, choices=[ParseMode.FULL, ParseMode.PRUNED])
+    argument_parser.add_argument('--baseline', default=os.path.join(BENCHMARKS_DIR, 'baseline.json'))
+    argument_parser.add_argument('--tolerance', type=float, default=0.25, help='allowed regression as a fraction')
+    argument_parser.add_argument('--update-baseline', action='store_true', help='save the results as the new baseline')
+    argument_parser.add_argument('--output', help='also write the results as JSON to this path')
+    args = argument_parser.parse_args()
+
+    logging.disable(logging.INFO)  # The parser logs every column of every article
+    results = run_benchmark(args.corpus, args.repeat, args.workers, args.parse_mode)
+    _print_results(results)
+
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+
+    for difference in results['differences']:
+        print(f'CHANGED {difference}')
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as baseline_file:
+            json.dump(results, baseline_file, indent=2)
+        print(f'Saved the baseline to {args.baseline}')
+        return 1 if results['differences'] != [] else 0
+
+    regressions = []
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        for environment_difference in get_environment_differences(results, baseline):
+            print(f'WARNING The baseline was recorded with {environment_difference}: timings are not compared')
+        regressions = compare(results, baseline, args.tolerance)
+    else:
+        print(f'No baseline at {args.baseline} to compare against')
+    for regression in regressions:
+        print(f'REGRESSED {regression}')
+    return 1 if results['differences'] != [] or regressions != [] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
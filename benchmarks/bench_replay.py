@@ -0,0 +1,103 @@
+"""End-to-end benchmark of GoogleNewsScraper against a ReplayServer,
+which serves the searches and articles recorded in WARC files instead
+of Google News and the publisher sites.
+
+    python benchmarks/bench_replay.py --record recordings/run.warc.gz --keywords "crude oil" "copper"
+    python benchmarks/bench_replay.py --warc recordings/run.warc.gz --keywords "crude oil" "copper" --workers 4
+    python benchmarks/bench_replay.py --warc recordings/run.warc.gz --keywords "crude oil" --latency 0.2 --failure-rate 0.1
+
+Recording scrapes the live sites once. Replays only depend on the WARC
+files, the injected latency and failures (drawn from --seed), so runs
+are repeatable on machines without internet access.
+"""
+from typing import Dict, List
+from scraper.config.metadata import Theme
+from scraper.news.google_news_scraper import GoogleNewsScraper
+from scraper.news.fetch_scheduler import FetchScheduler
+from scraper.news.replay_server import ReplayServer, FailureMode
+from scraper.news.warc_recorder import WarcRecorder
+
+import sys
+import json
+import time
+import argparse
+
+
+def record(path: str, keywords: List[str]) -> None:
+    """Scrape the articles of <keywords> from the live sites into the WARC file <path>.
+    """
+    recorder = WarcRecorder(path)
+    scraper = GoogleNewsScraper(decode_urls=False, use_cache=False, recorder=recorder)  # Record the live pages, not older cached copies
+    try:
+        for keyword in keywords:
+            for _ in scraper.get_search_articles(Theme.DEMAND, keyword):
+                pass
+    finally:
+        scraper.finish()
+        recorder.finish()
+
+
+def replay(server: ReplayServer, keywords: List[str], workers: int) -> Dict[str, float]:
+    """Return the articles/sec of scraping the articles of <keywords> from <server>.
+    """
+    start = time.perf_counter()
+    # Replayed publishers answer as fast as the server does, so they aren't rate limited,
+    # and injected failures are retried instead of stopping the publisher for the run
+    scheduler = FetchScheduler(rate_per_domain=1000.0, burst=max(workers, 2), failure_threshold=1_000_000)
+    scraper = GoogleNewsScraper(
+        workers=workers,
+        decode_urls=False,
+        use_cache=False,  # Every run replays all of its articles instead of reading earlier runs' cached pages
+        scheduler=scheduler,
+        site_url=server.get_url(GoogleNewsScraper.site_url),
+        domain=server.get_domain(GoogleNewsScraper.domain),
+        site_config=server.get_site_config()
+    )
+    try:
+        articles = sum(1 for keyword in keywords for _ in scraper.get_search_articles(Theme.DEMAND, keyword))
+    finally:
+        scraper.finish()
+    seconds = time.perf_counter() - start
+    return {
+        'articles': articles,
+        'seconds': seconds,
+        'articles_per_sec': articles / seconds,
+        'requests': server.requests,
+        'failures': server.failures
+    }
+
+
+def main() -> int:
+    argument_parser = argparse.ArgumentParser(description='Benchmark GoogleNewsScraper against recorded sites.')
+    argument_parser.add_argument('--keywords', nargs='+', required=True, help='keywords searched (recorded ones when replaying)')
+    argument_parser.add_argument('--record', help='record the live sites to this WARC file instead of replaying')
+    argument_parser.add_argument('--warc', nargs='+', default=[], help='WARC files to replay')
+    argument_parser.add_argument('--workers', type=int, default=1, help='browsers visiting articles')
+    argument_parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    argument_parser.add_argument('--jitter', type=float, default=0.0, help='up to this many more seconds per response')
+    argument_parser.add_argument('--failure-rate', type=float, default=0.0, help='fraction of responses that fail')
+    argument_parser.add_argument('--failure-mode', default=FailureMode.STATUS, choices=[FailureMode.STATUS, FailureMode.HANG, FailureMode.RESET])
+    argument_parser.add_argument('--seed', type=int, default=0)
+    argument_parser.add_argument('--output', help='also write the results as JSON to this path')
+    args = argument_parser.parse_args()
+
+    if args.record is not None:
+        record(args.record, args.keywords)
+        return 0
+
+    if args.warc == []:
+        argument_parser.error('either --record or --warc is required')
+    with ReplayServer(args.warc, latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate,
+                      failure_mode=args.failure_mode, seed=args.seed) as server:
+        results = replay(server, args.keywords, args.workers)
+
+    print(f'{results["articles"]} articles in {results["seconds"]:.1f} s ({results["articles_per_sec"]:.2f} articles/sec), '
+          f'{results["requests"]} requests with {results["failures"]} injected failures')
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(results, output_file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+from logging import Logger
+from queue import Queue
+from threading import Lock
+from dataclasses import dataclass
+from typing import Callable, List
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from scraper.config.metadata import Article
+from scraper.utils import setup_logger
+
+
+@dataclass
+class BrowserPool:
+    """A pool of browser workers that visit article URLs concurrently.
+    Each worker owns a single browser session and is handed out to
+    one thread at a time. A worker whose session crashes is restarted
+    and the article is retried, so one dead browser doesn't stall the batch.
+    """
+    size: int
+    _logger: Logger
+    _idle_workers: Queue
+    _workers: List
+    _worker_factory: Callable
+    _lock: Lock
+    _opening: int = 0
+    max_restarts: int = 1
+
+    def __init__(self, worker_factory: Callable, size: int, seed_workers: List = None, max_restarts: int = 1) -> None:
+        """Create a pool of <size> workers. Workers in <seed_workers>
+        (e.g. an already opened scraper) are reused, and the rest are
+        created lazily by calling <worker_factory>.
+        """
+        self._logger = setup_logger(self.__class__.__name__)
+        self._worker_factory = worker_factory
+        self.size = size
+        self.max_restarts = max_restarts
+        self._workers = list(seed_workers or [])[:size]
+        self._idle_workers = Queue()
+        self._lock = Lock()
+        self._opening = 0
+        for worker in self._workers:
+            self._idle_workers.put(worker)
+
+    def _checkout(self):
+        """Return an idle worker, opening a new browser if the pool
+        hasn't reached its size yet.
+        """
+        with self._lock:
+            open_new_worker = self._idle_workers.empty() and self._opening + len(self._workers) < self.size
+            if open_new_worker:
+                self._opening += 1  # Reserve the slot while the browser opens
+
+        if not open_new_worker:
+            return self._idle_workers.get()
+
+        try:
+            self._logger.info(f'Opening a new browser worker for the pool of {self.size}')
+            worker = self._worker_factory()
+            with self._lock:
+                self._workers.append(worker)
+            return worker
+        finally:
+            with self._lock:
+                self._opening -= 1
+
+    def visit(self, article_url: str) -> Article:
+        """Get the article info from <article_url> using an idle worker.
+        Restart the worker's browser and try again if its session crashes.
+        Safe to call from several threads at once (e.g. by a FetchScheduler).
+        """
+        worker = self._checkout()
+        try:
+            for attempt in range(self.max_restarts + 1):
+                try:
+                    return worker._get_article_info(article_url)
+                except TimeoutException:
+                    raise
+                except WebDriverException:
+                    if attempt == self.max_restarts:
+                        raise
+                    self._logger.error(f'Browser session crashed while visiting {article_url}. Restarting the worker and trying again')
+                    worker._restart_browser()
+        finally:
+            self._idle_workers.put(worker)
+
+    def finish(self, keep: List = None) -> None:
+        """Close the browser of every worker except those in <keep>.
+        """
+        keep = keep or []
+        for worker in self._workers:
+            if not any(worker is kept for kept in keep):
+                worker.finish()
+        self._workers = [worker for worker in self._workers if any(worker is kept for kept in keep)]
+        self._idle_workers = Queue()
+        for worker in self._workers:
+            self._idle_workers.put(worker)
@@ -0,0 +1,94 @@
+from dataclasses import dataclass, field
+from typing import List
+from selenium.webdriver.edge.options import Options
+from selenium.webdriver.edge.webdriver import WebDriver
+from scraper.metrics import get_metrics
+
+
+@dataclass
+class PageLoadStrategy:
+    """When the browser considers a navigation done.
+    """
+    NORMAL: str = 'normal'
+    EAGER: str = 'eager'
+
+
+_BLOCKED_RESOURCE_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico', '*.bmp',
+    '*.mp4', '*.webm', '*.m3u8', '*.mp3', '*.wav', '*.ogg',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot'
+]
+_BLOCKED_HOST_PATTERNS = [
+    '*doubleclick.net*', '*googlesyndication.com*', '*googletagservices.com*', '*googletagmanager.com*',
+    '*google-analytics.com*', '*adservice.google.*', '*amazon-adsystem.com*', '*adnxs.com*', '*criteo.com*',
+    '*taboola.com*', '*outbrain.com*', '*scorecardresearch.com*', '*quantserve.com*', '*chartbeat.com*',
+    '*hotjar.com*', '*connect.facebook.net*', '*moatads.com*', '*pubmatic.com*', '*rubiconproject.com*'
+]
+
+
+@dataclass
+class BrowserProfile:
+    """How the Edge browser is started and what it loads.
+
+    * <headless> runs the browser without a window.
+    * <page_load_strategy> EAGER returns from a navigation once the DOM is
+      ready, instead of waiting for every subresource to finish loading.
+    * <block_resources> blocks images, media, fonts and known ad/analytics
+      hosts through CDP, so that they are never downloaded.
+    * <wait_for_instructions> waits for the elements the parser instructions
+      of the article's site need, instead of the full page load.
+    """
+    headless: bool = False
+    page_load_strategy: str = PageLoadStrategy.NORMAL
+    block_resources: bool = False
+    wait_for_instructions: bool = False
+    blocked_url_patterns: List[str] = field(default_factory=list)
+    window_size: str = '1920,1080'
+
+    def __init__(self, headless: bool = False, page_load_strategy: str = PageLoadStrategy.NORMAL,
+                 block_resources: bool = False, wait_for_instructions: bool = False,
+                 blocked_url_patterns: List[str] = None) -> None:
+        """<blocked_url_patterns> replaces the default patterns of
+        blocked resources and hosts (wildcards allowed).
+        """
+        self.headless = headless
+        self.page_load_strategy = page_load_strategy
+        self.block_resources = block_resources
+        self.wait_for_instructions = wait_for_instructions
+        self.blocked_url_patterns = blocked_url_patterns if blocked_url_patterns is not None else _BLOCKED_RESOURCE_PATTERNS + _BLOCKED_HOST_PATTERNS
+
+    def get_options(self) -> Options:
+        options = Options()
+        options.page_load_strategy = self.page_load_strategy
+        if self.headless:
+            options.add_argument('--headless=new')
+            options.add_argument(f'--window-size={self.window_size}')
+        if self.block_resources:
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        return options
+
+    def get_ready_states(self) -> List[str]:
+        """Return the document ready states at which a page counts as loaded.
+        """
+        if self.page_load_strategy == PageLoadStrategy.EAGER:
+            return ['interactive', 'complete']
+        return ['complete']
+
+    def open_browser(self) -> WebDriver:
+        """Open an Edge browser with this profile.
+        """
+        with get_metrics().time('browser_start_seconds'):
+            driver = WebDriver(options=self.get_options())
+            if self.block_resources:
+                driver.execute_cdp_cmd('Network.enable', {})
+                driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': self.blocked_url_patterns})
+        return driver
+
+
+DEFAULT_PROFILE = BrowserProfile()
+PERFORMANCE_PROFILE = BrowserProfile(
+    headless=True,
+    page_load_strategy=PageLoadStrategy.EAGER,
+    block_resources=True,
+    wait_for_instructions=True
+)
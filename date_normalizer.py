@@ -0,0 +1,192 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from scraper.metrics import get_metrics
+
+import pandas as pd
+
+
+_FORMATS = [
+    'ISO8601',
+    '%B %d, %Y',
+    '%b %d, %Y',
+    '%B %d, %Y %I:%M %p',
+    '%b %d, %Y %I:%M %p',
+    '%A, %B %d, %Y',
+    '%d %B %Y',
+    '%d %b %Y',
+    '%d %B %Y %H:%M',
+    '%d %b %Y %H:%M',
+    '%d-%b-%Y',
+    '%m/%d/%Y',
+    '%d/%m/%Y',
+    '%m/%d/%Y %I:%M %p',
+    '%Y/%m/%d',
+    '%d.%m.%Y',
+    '%a, %d %b %Y %H:%M:%S %z',
+    '%a, %d %b %Y %H:%M:%S'
+]
+_AMBIGUOUS_FORMATS = [  # Formats that parse the same dates differently (03/04/2025), of which a site uses one
+    ('%m/%d/%Y', '%d/%m/%Y')
+]
+_CLEANUPS = [  # RE2 syntax, so that pyarrow cleans whole columns
+    (r'(?i)^\s*(?:last\s+)?(?:published|updated|posted|modified|date)\s*(?:on|at)?\s*[:\-]?\s*', ''),
+    (r'(?i)(\d)(?:st|nd|rd|th)\b', r'\1'),
+    (r'(?i)\bsept\b', 'Sep'),
+    (r'([A-Za-z])\.', r'\1'),
+    (r'(?i)\s+(?:at|\||-|•)\s+', ' '),
+    (r'(?i)\s+(?:[ECMP][SD]?T|GMT|UTC)$', ''),
+    (r'\s+', ' ')
+]
+_MONTH = r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*'
+_DATE_SUBSTRING = (
+    r'(\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?)?'
+    rf'|{_MONTH} \d{{1,2}}, \d{{4}}'
+    rf'|\d{{1,2}} {_MONTH} \d{{4}}'
+    r'|\d{1,2}/\d{1,2}/\d{4})'
+)
+_RELATIVE_DATE = (
+    r'^(?:(?P<count>\d+|an?|one)\s*(?P<unit>s|sec|second|m|min|minute|h|hr|hour|d|day|w|week|mo|month|y|yr|year)s?\s+ago'
+    r'|(?P<word>just now|now|today|yesterday))$'
+)
+_UNIT_SECONDS = {
+    's': 1, 'sec': 1, 'second': 1,
+    'm': 60, 'min': 60, 'minute': 60,
+    'h': 3600, 'hr': 3600, 'hour': 3600,
+    'd': 86400, 'day': 86400,
+    'w': 604800, 'week': 604800,
+    'mo': 2592000, 'month': 2592000,
+    'y': 31536000, 'yr': 31536000, 'year': 31536000
+}
+_RELATIVE_HINT = r'(?i)(?:ago|now|today|yesterday)$'
+_WORD_SECONDS = {'just now': 0, 'now': 0, 'today': 0, 'yesterday': 86400}
+_DATETIME_DTYPE = 'datetime64[ns, UTC]'
+
+
+@dataclass
+class DateNormalizer:
+    """Parses the raw dates of articles ("Published: Feb 7, 2025",
+    ISO stamps, "2 days ago", ...) into UTC timestamps, a whole column
+    at a time.
+
+    The formats are tried per site, starting with the ones that parsed
+    the most of that site's dates so far, so a site's dates usually
+    parse in one vectorized call with its learned format. Dates without
+    a time zone (or with an abbreviated one) are taken as UTC, and
+    relative dates are resolved against the time their article was fetched.
+
+    Of ambiguous formats (day/month or month/day), a site's dates are all
+    parsed with one: the one that parses the most of them, which is kept
+    for the site once the dates tell them apart (e.g. 25/04/2025).
+    """
+    formats: List[str] = field(default_factory=list)
+    format_hits: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    site_formats: Dict[Tuple[str, Tuple[str, ...]], str] = field(default_factory=dict)
+
+    def __init__(self, formats: List[str] = None) -> None:
+        """<formats> are the candidate pandas/strptime formats, in the
+        order they are tried for a site not seen yet.
+        """
+        self.formats = list(formats) if formats is not None else list(_FORMATS)
+        self.format_hits = {}
+        self.site_formats = {}
+
+    def get_formats(self, site: str) -> List[str]:
+        """Return the formats to try for <site>, the most successful ones first.
+        """
+        return sorted(self.formats, key=lambda date_format: -self.format_hits.get((site, date_format), 0))
+
+    def _clean(self, dates: pd.Series) -> pd.Series:
+        dates = dates.astype('string[pyarrow]')
+        for pattern, replacement in _CLEANUPS:
+            dates = dates.str.replace(pattern, replacement, regex=True)
+        return dates.str.strip()
+
+    def _choose_format(self, site: str, ambiguous_formats: Tuple[str, ...], dates: pd.Series) -> str:
+        """Return the format of <ambiguous_formats> that <site> uses: the one
+        kept for it, or else the one parsing the most of <dates> (the most
+        successful one so far on a tie), kept if the others parse fewer.
+        """
+        if (site, ambiguous_formats) in self.site_formats:
+            return self.site_formats[(site, ambiguous_formats)]
+        hits = {
+            date_format: int(pd.to_datetime(dates, format=date_format, errors='coerce', utc=True).notna().sum())
+            for date_format in self.get_formats(site) if date_format in ambiguous_formats
+        }
+        chosen_format = max(hits, key=hits.get)
+        if len(set(hits.values())) > 1:
+            self.site_formats[(site, ambiguous_formats)] = chosen_format
+        return chosen_format
+
+    def _parse_formats(self, site: str, dates: pd.Series, parsed: pd.Series) -> pd.Series:
+        """Parse the <dates> of <site> into <parsed> with each format in turn
+        (only the chosen one of ambiguous formats), and return the dates
+        that none of them parsed.
+        """
+        chosen_formats = {}
+        for date_format in self.get_formats(site):
+            if dates.empty:
+                break
+            ambiguous_formats = next((formats for formats in _AMBIGUOUS_FORMATS if date_format in formats), None)
+            if ambiguous_formats is not None:
+                if ambiguous_formats not in chosen_formats:
+                    chosen_formats[ambiguous_formats] = self._choose_format(site, ambiguous_formats, dates)
+                if date_format != chosen_formats[ambiguous_formats]:
+                    continue
+            attempt = pd.to_datetime(dates, format=date_format, errors='coerce', utc=True)
+            hits = attempt.notna()
+            if hits.any():
+                parsed.loc[hits[hits].index] = attempt[hits].astype(_DATETIME_DTYPE)
+                self.format_hits[(site, date_format)] = self.format_hits.get((site, date_format), 0) + int(hits.sum())
+                dates = dates[~hits]
+        return dates
+
+    def _parse_relative(self, dates: pd.Series, fetched_at: pd.Series, parsed: pd.Series) -> pd.Series:
+        """Parse the relative <dates> (e.g. "3 hours ago", "yesterday") into
+        <parsed>, and return the dates that aren't relative.
+        """
+        candidates = dates.str.contains(_RELATIVE_HINT, regex=True)
+        if not candidates.any():
+            return dates
+        parts = dates[candidates].str.lower().str.extract(_RELATIVE_DATE)
+        counts = pd.to_numeric(parts['count'].replace({'a': '1', 'an': '1', 'one': '1'}), errors='coerce')
+        seconds = counts * parts['unit'].map(_UNIT_SECONDS)
+        seconds = seconds.fillna(parts['word'].map(_WORD_SECONDS))
+        hits = seconds.notna()
+        if hits.any():
+            index = hits[hits].index
+            parsed.loc[index] = fetched_at.loc[index] - pd.to_timedelta(seconds[hits].astype('float'), unit='s')
+        return dates.drop(hits[hits].index)
+
+    def normalize(self, dates: pd.Series, sites: pd.Series, fetched_at: pd.Series) -> pd.Series:
+        """Return the <dates> of articles from <sites>, fetched at the times
+        <fetched_at>, as a datetime64[ns, UTC] series (NaT where a date is
+        missing or couldn't be parsed).
+        """
+        metrics = get_metrics()
+        parsed = pd.Series(pd.NaT, index=dates.index, dtype=_DATETIME_DTYPE)
+        fetched_at = pd.to_datetime(fetched_at, utc=True).astype(_DATETIME_DTYPE)
+        cleaned = self._clean(dates)
+        present = cleaned.notna() & (cleaned != '')
+        # Relative dates go first, since pandas would parse "now" and "today" as the current time
+        absolute = self._parse_relative(cleaned[present], fetched_at, parsed)
+
+        unparsed = []
+        for site, site_dates in absolute.groupby(sites.loc[absolute.index].astype('string').fillna(''), sort=False):
+            remaining = self._parse_formats(site, site_dates, parsed)
+            if not remaining.empty:
+                substrings = remaining.str.extract(_DATE_SUBSTRING, expand=False).dropna()
+                self._parse_formats(site, substrings, parsed)
+                remaining = remaining[parsed.loc[remaining.index].isna()]
+            unparsed.append(remaining)
+
+        remaining = pd.concat(unparsed) if unparsed != [] else absolute
+
+        metrics.increment('dates_normalized_total', int(parsed.notna().sum()), outcome='parsed')
+        metrics.increment('dates_normalized_total', len(remaining), outcome='failed')
+        return parsed
+
+    def normalize_table(self, articles_df: pd.DataFrame) -> pd.Series:
+        """Return the normalized dates of a table of articles with
+        date, site and fetched_at columns.
+        """
+        return self.normalize(articles_df['date'], articles_df['site'], articles_df['fetched_at'])
@@ -0,0 +1,169 @@
+from dataclasses import dataclass, field, replace
+from typing import Dict, Generator, Iterable, List, Optional
+from scraper.config.metadata import Row
+from scraper.metrics import get_metrics
+
+import re
+import zlib
+import numpy as np
+
+
+_WORD_PATTERN = re.compile(r'\w+')
+_SHINGLE_MULTIPLIER = np.uint64(0x100000001B3)
+
+
+@dataclass
+class DuplicateAction:
+    """What is done with the rows of near-duplicate articles.
+    """
+    DROP: str = 'drop'
+    GROUP: str = 'group'
+
+
+@dataclass
+class DuplicateDetector:
+    """Finds articles whose content is a near-duplicate of an article seen
+    before (e.g. a press release reprinted by several sites), incrementally
+    and at a cost that doesn't grow with the number of articles seen.
+
+    The content of each article is reduced to its set of <shingle_size>-word
+    shingles and a MinHash signature of <num_perm> values, which is split into
+    <bands> bands indexed in hash tables (LSH). Articles sharing a band with
+    the new one are candidates, and a candidate whose signature agrees with
+    it on at least <threshold> of the values (its estimated Jaccard
+    similarity) is a duplicate. Each article joins the cluster of the first
+    article it duplicates, which is identified by that article's URL.
+    An article seen again under the same key (e.g. found by another
+    keyword) is never a duplicate of itself, and keeps its cluster.
+    Contents shorter than <min_words> words are never taken as duplicates.
+    """
+    _multipliers: np.ndarray
+    _offsets: np.ndarray
+    _signatures: np.ndarray
+    _buckets: List[Dict[bytes, List[int]]] = field(default_factory=list)
+    _cluster_ids: List[int] = field(default_factory=list)
+    _indices: Dict[str, int] = field(default_factory=dict)
+    keys: List[str] = field(default_factory=list)
+    action: str = DuplicateAction.DROP
+    num_perm: int = 128
+    bands: int = 16
+    shingle_size: int = 4
+    threshold: float = 0.8
+    min_words: int = 20
+
+    def __init__(self, action: str = DuplicateAction.DROP, num_perm: int = 128, bands: int = 16, shingle_size: int = 4,
+                 threshold: float = 0.8, min_words: int = 20, seed: int = 0) -> None:
+        """<num_perm> must be a multiple of <bands>. The permutations are drawn
+        from <seed>, so signatures only compare between detectors with the same one.
+        """
+        if num_perm % bands != 0:
+            raise ValueError(f'num_perm ({num_perm}) must be a multiple of bands ({bands})')
+        self.action = action
+        self.num_perm = num_perm
+        self.bands = bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.min_words = min_words
+        random = np.random.default_rng(seed)
+        self._multipliers = random.integers(1, 2 ** 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._offsets = random.integers(0, 2 ** 63, size=(num_perm, 1), dtype=np.uint64)
+        self._signatures = np.empty((0, num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(bands)]
+        self._cluster_ids = []
+        self._indices = {}
+        self.keys = []
+
+    def get_shingles(self, content: str) -> np.ndarray:
+        """Return the distinct hashes of the word shingles of <content>
+        (empty if it has fewer than <min_words> words).
+        """
+        words = _WORD_PATTERN.findall(content.lower())
+        if len(words) < max(self.min_words, self.shingle_size):
+            return np.empty(0, dtype=np.uint64)
+        word_hashes = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+        count = len(words) - self.shingle_size + 1
+        shingles = word_hashes[:count].copy()
+        with np.errstate(over='ignore'):
+            for position in range(1, self.shingle_size):
+                shingles = (shingles * _SHINGLE_MULTIPLIER) ^ word_hashes[position:position + count]
+        return np.unique(shingles)
+
+    def get_signature(self, shingles: np.ndarray) -> np.ndarray:
+        """Return the MinHash signature of the set of <shingles>: for each of
+        the <num_perm> multiply-shift hash functions, the least hash of a shingle.
+        """
+        with np.errstate(over='ignore'):
+            hashes = (self._multipliers * shingles[np.newaxis, :] + self._offsets) >> np.uint64(32)
+        return hashes.min(axis=1).astype(np.uint32)
+
+    def _get_band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.bands, -1)]
+
+    def _get_duplicate(self, signature: np.ndarray, band_keys: List[bytes]) -> Optional[int]:
+        """Return the index of the most similar indexed article that
+        <signature> is a near-duplicate of, if any.
+        """
+        candidates = {index for bucket, band_key in zip(self._buckets, band_keys) for index in bucket.get(band_key, [])}
+        if candidates == set():
+            return None
+        candidates = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        similarities = (self._signatures[candidates] == signature).mean(axis=1)
+        best = int(similarities.argmax())
+        return int(candidates[best]) if similarities[best] >= self.threshold else None
+
+    def _index(self, signature: np.ndarray, band_keys: List[bytes]) -> int:
+        index = len(self.keys)
+        if index == len(self._signatures):
+            grown = np.empty((max(64, 2 * index), self.num_perm), dtype=np.uint32)
+            grown[:index] = self._signatures
+            self._signatures = grown
+        self._signatures[index] = signature
+        for bucket, band_key in zip(self._buckets, band_keys):
+            bucket.setdefault(band_key, []).append(index)
+        return index
+
+    def add(self, key: str, content: Optional[str]) -> Optional[str]:
+        """Index the article <key> (e.g. its URL) with <content>, and return the
+        key of the cluster it is a near-duplicate in (None if it is not one).
+        """
+        metrics = get_metrics()
+        if key in self._indices:
+            cluster_key = self.keys[self._cluster_ids[self._indices[key]]]
+            metrics.increment('duplicate_checks_total', outcome='seen')
+            return cluster_key if cluster_key != key else None
+
+        shingles = self.get_shingles(content) if content is not None else np.empty(0, dtype=np.uint64)
+        if shingles.size == 0:
+            metrics.increment('duplicate_checks_total', outcome='skipped')
+            return None
+
+        signature = self.get_signature(shingles)
+        band_keys = self._get_band_keys(signature)
+        duplicate = self._get_duplicate(signature, band_keys)
+        index = self._index(signature, band_keys)
+        self._indices[key] = index
+        self.keys.append(key)
+        self._cluster_ids.append(self._cluster_ids[duplicate] if duplicate is not None else index)
+        metrics.increment('duplicate_checks_total', outcome='duplicate' if duplicate is not None else 'unique')
+        return self.keys[self._cluster_ids[duplicate]] if duplicate is not None else None
+
+    def filter(self, rows: Iterable[Row]) -> Generator[Row, None, None]:
+        """Yield <rows> as they come, leaving out the near-duplicates with
+        DuplicateAction.DROP, or with the key of their cluster as duplicate_of
+        with DuplicateAction.GROUP.
+        """
+        for row in rows:
+            duplicate_of = self.add(row.url, row.content)
+            if duplicate_of is None:
+                yield row
+            elif self.action == DuplicateAction.GROUP:
+                yield replace(row, duplicate_of=duplicate_of)
+
+    def clusters(self) -> Dict[str, List[str]]:
+        """Return the keys of the articles of each cluster with more than
+        one article, by the key of its first article.
+        """
+        clusters = {}
+        for key, cluster_id in zip(self.keys, self._cluster_ids):
+            clusters.setdefault(self.keys[cluster_id], []).append(key)
+        return {cluster_key: keys for cluster_key, keys in clusters.items() if len(keys) > 1}
@@ -0,0 +1,132 @@
+from logging import Logger
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from scraper.config.news_parser_config import NewsParserConfig
+from scraper.config.news_site_config import SiteConfig
+from scraper.utils import setup_logger
+
+
+@dataclass
+class FetchAction:
+    """What to do with an article before spending a browser visit on it.
+    """
+    PARSE: str = 'fetch_and_parse'
+    ARCHIVE: str = 'fetch_and_archive'
+    SKIP: str = 'skip'
+
+
+@dataclass
+class FetchPlan:
+    """The article URLs of a search, split by the action planned for each.
+    """
+    actions: Dict[str, List[str]]
+    sites: Dict[str, str]
+    browser_seconds_per_article: float
+
+    @property
+    def parse_urls(self) -> List[str]:
+        return self.actions[FetchAction.PARSE]
+
+    @property
+    def archive_urls(self) -> List[str]:
+        return self.actions[FetchAction.ARCHIVE]
+
+    @property
+    def skip_urls(self) -> List[str]:
+        return self.actions[FetchAction.SKIP]
+
+    @property
+    def fetch_urls(self) -> List[str]:
+        """Return the URLs that still need to be fetched, in their original order.
+        """
+        fetch_urls = set(self.parse_urls) | set(self.archive_urls)
+        return [url for url in self.sites if url in fetch_urls]
+
+    def browser_seconds_saved(self) -> float:
+        """Return the estimated browser time (in seconds) saved by
+        not visiting the skipped articles.
+        """
+        return len(self.skip_urls) * self.browser_seconds_per_article
+
+    def report(self) -> str:
+        return (
+            f'{len(self.parse_urls)} to fetch and parse, {len(self.archive_urls)} to fetch and archive only, '
+            f'{len(self.skip_urls)} skipped (~{self.browser_seconds_saved():.0f} s of browser time saved)'
+        )
+
+
+@dataclass
+class FetchPlanner:
+    """Plans which searched articles are worth a browser visit, using the
+    site known from the search results page (publisher name or decoded URL)
+    and whether the parser has instructions for it.
+
+    * Sites with instructions are fetched and parsed.
+    * With <use_extractor> (set as in the ArticleParser the articles are
+      parsed with), every other site is fetched and parsed too, since its
+      articles are extracted generically.
+    * Otherwise, known sites without instructions get <uninstructed_action>,
+      and unknown sites ('TBD') get <unknown_action>, e.g. archived so
+      that instructions can be written for them later. Articles are only
+      archived when their page is kept (see plan), and skipped otherwise.
+    """
+    _logger: Logger
+    config: NewsParserConfig = NewsParserConfig()
+    site_config: SiteConfig = SiteConfig()
+    uninstructed_action: str = FetchAction.SKIP
+    unknown_action: str = FetchAction.ARCHIVE
+    use_extractor: bool = False
+    browser_seconds_per_article: float = 15.0
+    totals: Dict[str, int] = field(default_factory=dict)
+
+    def __init__(self, uninstructed_action: str = FetchAction.SKIP, unknown_action: str = FetchAction.ARCHIVE,
+                 browser_seconds_per_article: float = 15.0, use_extractor: bool = False) -> None:
+        """<browser_seconds_per_article> is the estimated browser time
+        of visiting one article, used for reporting the time saved.
+        """
+        self._logger = setup_logger(self.__class__.__name__)
+        self.uninstructed_action = uninstructed_action
+        self.unknown_action = unknown_action
+        self.use_extractor = use_extractor
+        self.browser_seconds_per_article = browser_seconds_per_article
+        self.totals = {FetchAction.PARSE: 0, FetchAction.ARCHIVE: 0, FetchAction.SKIP: 0}
+
+    def get_site(self, article_url: str, publisher_site: Optional[str] = None) -> str:
+        """Return the site of <article_url>, preferring the site resolved
+        from the publisher name on the search results page.
+        """
+        if publisher_site is not None and publisher_site != 'TBD':
+            return publisher_site
+        return self.site_config.get_site_name(article_url)
+
+    def get_action(self, site: str, archivable: bool = True) -> str:
+        if self.config.has_instructions(site) or self.use_extractor:
+            return FetchAction.PARSE
+        action = self.uninstructed_action if site in self.config.instructions else self.unknown_action
+        if action == FetchAction.ARCHIVE and not archivable:
+            return FetchAction.SKIP
+        return action
+
+    def plan(self, article_urls: List[str], publisher_sites: Dict[str, str] = None, archivable: bool = True) -> FetchPlan:
+        """Plan the action for each of <article_urls>. <publisher_sites> maps
+        URLs to the site resolved from their search result card, if known.
+        Unless <archivable> (i.e. fetched pages are kept, in a cache or a
+        recording), articles planned for archiving are skipped instead.
+        """
+        publisher_sites = publisher_sites or {}
+        sites = {article_url: self.get_site(article_url, publisher_sites.get(article_url)) for article_url in article_urls}
+        actions = {FetchAction.PARSE: [], FetchAction.ARCHIVE: [], FetchAction.SKIP: []}
+        for article_url, site in sites.items():
+            actions[self.get_action(site, archivable)].append(article_url)
+
+        for action, urls in actions.items():
+            self.totals[action] += len(urls)
+
+        fetch_plan = FetchPlan(actions, sites, self.browser_seconds_per_article)
+        self._logger.info(f'Fetch plan: {fetch_plan.report()}')
+        return fetch_plan
+
+    def browser_seconds_saved(self) -> float:
+        """Return the estimated browser time (in seconds) saved across every plan so far.
+        """
+        return self.totals[FetchAction.SKIP] * self.browser_seconds_per_article
@@ -0,0 +1,264 @@
+from logging import Logger
+from threading import Lock
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Generator, List, Optional, Set, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from selenium.common.exceptions import WebDriverException
+from scraper.config.metadata import Article
+from scraper.config.news_site_config import SiteConfig
+from scraper.news.interstitial import BlockedPageError
+from scraper.utils import setup_logger
+from scraper.metrics import get_metrics
+
+import time
+import heapq
+import random
+
+
+@dataclass
+class TokenBucket:
+    """Allows <rate> requests per second on average, with bursts
+    of up to <capacity> requests.
+    """
+    rate: float
+    capacity: float
+    tokens: float
+    updated: float
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def try_acquire(self, now: float) -> float:
+        """Take a token if there is one and return 0, otherwise
+        return the seconds until there will be one.
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+@dataclass
+class CircuitState:
+    """The state of a circuit breaker.
+    """
+    CLOSED: str = 'closed'
+    OPEN: str = 'open'
+    HALF_OPEN: str = 'half_open'
+
+
+@dataclass
+class CircuitBreaker:
+    """Stops requests to a domain after <failure_threshold> failures in a
+    row. After <reset_timeout> seconds, one trial request is let through:
+    its success closes the circuit again, and its failure reopens it.
+    """
+    failure_threshold: int
+    reset_timeout: float
+    state: str = CircuitState.CLOSED
+    failures: int = 0
+    opened_at: float = 0.0
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def is_open(self, now: float) -> bool:
+        """Check if requests are stopped and it isn't time for a trial request yet.
+        """
+        return self.state == CircuitState.OPEN and now - self.opened_at < self.reset_timeout
+
+    def allow(self, now: float) -> bool:
+        """Check if a request can be made now, letting the
+        trial request through once the circuit is due.
+        """
+        if self.state == CircuitState.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = CircuitState.HALF_OPEN
+            return True
+        return self.state == CircuitState.CLOSED
+
+    def record_success(self) -> None:
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+
+    def record_failure(self, now: float) -> None:
+        self.failures += 1
+        if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = CircuitState.OPEN
+            self.opened_at = now
+
+
+@dataclass
+class FetchScheduler:
+    """Schedules article visits across domains.
+
+    * Each domain has a token bucket of <rate_per_domain> visits per
+      second (bursts of <burst>), so that other domains are visited
+      while one is rate limited.
+    * Failed visits (timeouts, browser and connection errors) are retried
+      up to <max_retries> times, with exponential backoff of <backoff_base>
+      seconds doubled on each attempt (at most <backoff_max>).
+    * Each domain has a circuit breaker that skips its articles after
+      <failure_threshold> failures in a row, for <reset_timeout> seconds.
+    * Links on <redirect_domains> (e.g. Google News links that weren't
+      decoded) lead to many publishers, so they are neither rate limited
+      nor counted against a breaker, unless their publisher is known.
+
+    Articles are never visited again once they have been scraped, and
+    the articles that couldn't be scraped are yielded as None.
+    """
+    _logger: Logger
+    _lock: Lock
+    rate_per_domain: float = 0.5
+    burst: int = 2
+    max_retries: int = 2
+    backoff_base: float = 2.0
+    backoff_max: float = 60.0
+    failure_threshold: int = 3
+    reset_timeout: float = 300.0
+    retry_exceptions: Tuple = (WebDriverException, TimeoutError, ConnectionError)
+    redirect_domains: Set[str] = field(default_factory=set)
+    buckets: Dict[str, TokenBucket] = field(default_factory=dict)
+    breakers: Dict[str, CircuitBreaker] = field(default_factory=dict)
+    site_config: SiteConfig = SiteConfig()
+
+    def __init__(self, rate_per_domain: float = 0.5, burst: int = 2, max_retries: int = 2, backoff_base: float = 2.0,
+                 backoff_max: float = 60.0, failure_threshold: int = 3, reset_timeout: float = 300.0,
+                 redirect_domains: List[str] = None) -> None:
+        self._logger = setup_logger(self.__class__.__name__)
+        self._lock = Lock()
+        self.rate_per_domain = rate_per_domain
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.redirect_domains = set(redirect_domains) if redirect_domains is not None else {'news.google.com'}
+        self.buckets = {}
+        self.breakers = {}
+
+    def _get_domain(self, article_url: str, publishers: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Return the domain <article_url> is rate limited and broken under: its
+        publisher in <publishers> if known, otherwise the domain of the URL
+        (None for a redirect domain, whose publisher isn't known before the visit).
+        """
+        if publishers is not None and article_url in publishers:
+            return publishers[article_url]
+        domain = self.site_config._get_site_domain(article_url) or article_url
+        return domain if domain not in self.redirect_domains else None
+
+    def _get_bucket(self, domain: str) -> TokenBucket:
+        if domain not in self.buckets:
+            self.buckets[domain] = TokenBucket(self.rate_per_domain, self.burst)
+        return self.buckets[domain]
+
+    def _get_breaker(self, domain: str) -> CircuitBreaker:
+        if domain not in self.breakers:
+            self.breakers[domain] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return self.breakers[domain]
+
+    def _get_backoff(self, attempt: int) -> float:
+        """Return the seconds to wait before retrying after <attempt> failed
+        attempts, with jitter so that retries don't line up.
+        """
+        return min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def _record_failure(self, domain: Optional[str]) -> None:
+        if domain is not None:
+            with self._lock:
+                self._get_breaker(domain).record_failure(time.monotonic())
+
+    def run(self, article_urls: List[str], visit: Callable[[str], Article], workers: int = 1,
+            publishers: Optional[Dict[str, str]] = None) -> Generator[Tuple[str, Optional[Article]], None, None]:
+        """Visit each of <article_urls> with <visit>, at most <workers> at a time,
+        and yield each (URL, article) pair as soon as it finishes. <publishers>
+        maps redirect links to their publisher (e.g. from the search results),
+        if known, which they are then rate limited under.
+        """
+        pending = []  # (ready time, order, URL, failed attempts)
+        for order, article_url in enumerate(dict.fromkeys(article_urls)):
+            heapq.heappush(pending, (0.0, order, article_url, 0))
+        order = len(pending)
+        running: Dict[Future, Tuple[str, int]] = {}
+        metrics = get_metrics()
+
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=self.__class__.__name__)
+        try:
+            while pending or running:
+                now = time.monotonic()
+                while pending and len(running) < workers and pending[0][0] <= now:
+                    _, _, article_url, attempts = heapq.heappop(pending)
+                    domain = self._get_domain(article_url, publishers)
+                    if domain is None:
+                        running[executor.submit(visit, article_url)] = (article_url, attempts)
+                        continue
+                    with self._lock:
+                        breaker = self._get_breaker(domain)
+                        skip = breaker.is_open(now)
+                        if skip:
+                            delay = 0.0
+                        elif breaker.state == CircuitState.HALF_OPEN:
+                            delay = 1 / self.rate_per_domain  # Wait for the trial visit of the domain, without a token
+                        else:
+                            delay = self._get_bucket(domain).try_acquire(now)
+                            if delay == 0:
+                                breaker.allow(now)  # Lets the trial visit through once the circuit is due
+                    if skip:
+                        self._logger.error(f'Skipping {article_url} while {domain} keeps failing')
+                        metrics.increment('article_visits_total', outcome='circuit_open')
+                        yield article_url, None
+                    elif delay > 0:
+                        order += 1
+                        heapq.heappush(pending, (now + delay, order, article_url, attempts))
+                    else:
+                        running[executor.submit(visit, article_url)] = (article_url, attempts)
+
+                if not running:
+                    if pending:
+                        time.sleep(max(0.0, pending[0][0] - time.monotonic()))
+                    continue
+
+                timeout = max(0.0, pending[0][0] - now) if pending and len(running) < workers else None
+                finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    article_url, attempts = running.pop(future)
+                    domain = self._get_domain(article_url, publishers)
+                    try:
+                        article = future.result()
+                    except BlockedPageError as error:
+                        self._logger.error(f'Skipping the article -> {error}')
+                        metrics.increment('article_visits_total', outcome='blocked')
+                        self._record_failure(domain)
+                        yield article_url, None
+                        continue
+                    except self.retry_exceptions as error:
+                        attempts += 1
+                        self._record_failure(domain)
+                        if attempts > self.max_retries:
+                            self._logger.error(f'Unable to scrape the article info from {article_url} after {attempts} attempts -> {error.__class__.__name__}')
+                            metrics.increment('article_visits_total', outcome='failed')
+                            yield article_url, None
+                            continue
+                        backoff = self._get_backoff(attempts)
+                        metrics.increment('article_visits_total', outcome='retried')
+                        self._logger.error(f'{error.__class__.__name__} when scraping {article_url}. Trying again in {backoff:.1f} seconds')
+                        order += 1
+                        heapq.heappush(pending, (time.monotonic() + backoff, order, article_url, attempts))
+                        continue
+
+                    if domain is not None:
+                        with self._lock:
+                            self._get_breaker(domain).record_success()
+                    metrics.increment('article_visits_total', outcome='scraped')
+                    yield article_url, article
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,186 @@
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional
+from lxml import etree
+from scraper.config.metadata import Schema
+
+import json
+
+
+_BLOCK_TAGS = ('p', 'h2', 'h3', 'h4', 'li', 'blockquote', 'pre')
+_BOILERPLATE_TAGS = ('nav', 'header', 'footer', 'aside', 'form', 'button', 'script', 'style', 'noscript')
+_ARTICLE_TYPES = {
+    'Article', 'NewsArticle', 'AnalysisNewsArticle', 'OpinionNewsArticle', 'ReportageNews',
+    'BlogPosting', 'Report', 'ScholarlyArticle', 'TechArticle', 'PressRelease'
+}
+_TITLE_META = ('og:title', 'twitter:title', 'dc.title', 'title')
+_DATE_META = (
+    'article:published_time', 'og:published_time', 'datepublished', 'pubdate', 'publishdate', 'publish-date',
+    'parsely-pub-date', 'sailthru.date', 'dc.date.issued', 'dc.date', 'date'
+)
+_AUTHOR_META = ('author', 'article:author', 'parsely-author', 'sailthru.author', 'dc.creator', 'byl')
+
+
+def _normalize(text: str) -> str:
+    return ' '.join(text.split())
+
+
+def _get_text(element: etree._Element) -> str:
+    return _normalize(''.join(element.itertext()))
+
+
+@dataclass
+class GenericExtractor:
+    """Extracts the columns of articles from sites without parsing
+    instructions, without knowing anything about their layout.
+
+    The title, date and author come from the page's JSON-LD article,
+    OpenGraph and <meta> tags (or its first <h1> and <time>). The content
+    is found by scoring paragraphs by their text length and link density:
+    each paragraph with at least <min_paragraph_length> characters, less
+    than <max_link_density> of them in links, scores for its parent (and
+    half for its grandparent). The content is the text of the blocks of
+    the best scoring element, leaving out link lists and boilerplate.
+    """
+    min_paragraph_length: int = 25
+    max_link_density: float = 0.5
+
+    def __init__(self, min_paragraph_length: int = 25, max_link_density: float = 0.5) -> None:
+        self.min_paragraph_length = min_paragraph_length
+        self.max_link_density = max_link_density
+
+    def _iter_json_ld(self, document: etree._Element) -> Iterator[Dict]:
+        """Yield the objects of every JSON-LD script of <document>, including
+        the ones listed in a @graph.
+        """
+        for script in document.iter('script'):
+            if 'ld+json' not in script.get('type', '') or not script.text:
+                continue
+            try:
+                data = json.loads(script.text)
+            except ValueError:
+                continue
+            pending = data if isinstance(data, list) else [data]
+            while pending != []:
+                item = pending.pop(0)
+                if isinstance(item, dict):
+                    pending.extend(item.get('@graph', []) if isinstance(item.get('@graph'), list) else [])
+                    yield item
+
+    def _get_json_ld_article(self, document: etree._Element) -> Dict:
+        """Return the first JSON-LD object of <document> whose @type (a
+        string or a list of strings) is an article type.
+        """
+        for item in self._iter_json_ld(document):
+            types = item.get('@type')
+            types = [types] if isinstance(types, str) else types if isinstance(types, list) else []
+            if {value for value in types if isinstance(value, str)} & _ARTICLE_TYPES:
+                return item
+        return {}
+
+    def _get_meta(self, document: etree._Element) -> Dict[str, str]:
+        """Return the content of each <meta> tag of <document> by its
+        lowercased property, name or itemprop (the first one wins).
+        """
+        meta = {}
+        for tag in document.iter('meta'):
+            key = tag.get('property') or tag.get('name') or tag.get('itemprop')
+            content = tag.get('content')
+            if key is not None and content is not None and content.strip() != '':
+                meta.setdefault(key.lower(), content.strip())
+        return meta
+
+    def _get_author_names(self, author) -> List[str]:
+        if isinstance(author, str):
+            return [author]
+        if isinstance(author, dict):
+            return [author['name']] if isinstance(author.get('name'), str) else []
+        if isinstance(author, list):
+            return [name for item in author for name in self._get_author_names(item)]
+        return []
+
+    def _get_title(self, document: etree._Element, article: Dict, meta: Dict[str, str]) -> Optional[str]:
+        for value in [article.get('headline'), article.get('name')] + [meta.get(key) for key in _TITLE_META]:
+            if isinstance(value, str) and value.strip() != '':
+                return _normalize(value)
+        for tag in ('h1', 'title'):
+            element = next(document.iter(tag), None)
+            if element is not None and _get_text(element) != '':
+                return _get_text(element)
+        return None
+
+    def _get_date(self, document: etree._Element, article: Dict, meta: Dict[str, str]) -> Optional[str]:
+        for value in [article.get('datePublished'), article.get('dateCreated')] + [meta.get(key) for key in _DATE_META]:
+            if isinstance(value, str) and value.strip() != '':
+                return value.strip()
+        for time_tag in document.iter('time'):
+            value = time_tag.get('datetime') or _get_text(time_tag)
+            if value.strip() != '':
+                return value.strip()
+        return None
+
+    def _get_author(self, document: etree._Element, article: Dict, meta: Dict[str, str]) -> Optional[str]:
+        names = [_normalize(name) for name in self._get_author_names(article.get('author'))]
+        names = [name for name in names if name != '']
+        if names != []:
+            return ', '.join(dict.fromkeys(names))
+        for key in _AUTHOR_META:
+            value = meta.get(key)
+            if value is not None and not value.startswith('http'):
+                return _normalize(value[3:] if value.lower().startswith('by ') else value)
+        return None
+
+    def _get_content(self, document: etree._Element, article: Dict) -> Optional[str]:
+        """Return the text of the blocks of the element with the most
+        (and least linked) paragraph text in <document>.
+        """
+        blocks = {}
+        scores = {}
+        for block in document.iter(*_BLOCK_TAGS):
+            text = _get_text(block)
+            if text == '':
+                continue
+            link_length = sum(len(''.join(link.itertext()).strip()) for link in block.iter('a'))
+            link_density = min(1.0, link_length / len(text))
+            blocks[block] = (text, link_density)
+            if block.tag != 'p' or len(text) < self.min_paragraph_length or link_density >= self.max_link_density:
+                continue
+            score = len(text) * (1 - link_density)
+            parent = block.getparent()
+            if parent is not None:
+                scores[parent] = scores.get(parent, 0) + score
+                grandparent = parent.getparent()
+                if grandparent is not None:
+                    scores[grandparent] = scores.get(grandparent, 0) + score / 2
+
+        if scores == {}:
+            body = article.get('articleBody')
+            return body.strip() if isinstance(body, str) and body.strip() != '' else None
+
+        container = max(scores, key=scores.get)
+        texts = []
+        for block in container.iter(*_BLOCK_TAGS):
+            if block not in blocks:
+                continue
+            text, link_density = blocks[block]
+            if link_density >= self.max_link_density:
+                continue
+            if next(block.iterancestors(*_BLOCK_TAGS), None) is not None:  # Already in an outer block's text
+                continue
+            if next(block.iterancestors(*_BOILERPLATE_TAGS), None) is not None:
+                continue
+            texts.append(text)
+        return '\n'.join(texts) if texts != [] else None
+
+    def extract(self, document: etree._Element) -> Dict[str, Optional[str]]:
+        """Return the value of each schema column extracted from <document>
+        (None for the ones that can't be found).
+        """
+        article = self._get_json_ld_article(document)
+        meta = self._get_meta(document)
+        column_values = {
+            Schema.TITLE: self._get_title(document, article, meta),
+            Schema.DATE: self._get_date(document, article, meta),
+            Schema.AUTHOR: self._get_author(document, article, meta),
+            Schema.CONTENT: self._get_content(document, article)
+        }
+        return {column: column_values[column] for column in Schema().get_columns()}
@@ -1,16 +1,30 @@
 from logging import Logger
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Union, Generator
+from typing import List, Dict, Optional, Tuple, Union, Generator
+from urllib.parse import urlparse, parse_qsl, urlencode
 from selenium.webdriver.edge.webdriver import WebDriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import InvalidSessionIdException
-from scraper.config.metadata import Theme, Article, SearchResult
+from selenium.common.exceptions import InvalidSessionIdException, TimeoutException, WebDriverException
+from scraper.config.metadata import Theme, Article, SearchCard, SearchResult, FetchMode
 from scraper.config.news_site_config import SiteConfig
+from scraper.config.news_parser_config import NewsParserConfig
+from scraper.config.browser_profile import BrowserProfile, DEFAULT_PROFILE
+from scraper.news.browser_pool import BrowserPool
+from scraper.news.http_fetcher import HttpArticleFetcher
+from scraper.news.html_cache import HtmlCache
+from scraper.news.html_capture import HtmlCapture
+from scraper.news.article_index import ArticleIndex
+from scraper.news.fetch_planner import FetchPlanner
+from scraper.news.url_decoder import GoogleNewsUrlDecoder
+from scraper.news.interstitial import InterstitialDetector, InterstitialOutcome
+from scraper.news.fetch_scheduler import FetchScheduler
+from scraper.news.warc_recorder import WarcRecorder
 from scraper.utils import setup_logger
+from scraper.metrics import get_metrics
 
 
 @dataclass
@@ -21,53 +35,224 @@ class GoogleNewsScraper:
     _driver: WebDriver
     _logger: Logger
     _search_bar: Optional[WebElement] = None
+    _pool: Optional[BrowserPool] = None
+    _http_fetcher: Optional[HttpArticleFetcher] = None
+    _url_decoder: Optional[GoogleNewsUrlDecoder] = None
+    _cache: Optional[HtmlCache] = None
+    _owns_cache: bool = False
+    index: Optional[ArticleIndex] = None
+    planner: Optional[FetchPlanner] = None
+    _search_cards: Dict[str, SearchCard] = None
+    detector: Optional[InterstitialDetector] = None
+    scheduler: Optional[FetchScheduler] = None
+    recorder: Optional[WarcRecorder] = None
+    capture: Optional[HtmlCapture] = None
+    workers: int = 1
+    fetch_mode: str = FetchMode.BROWSER
+    decode_urls: bool = True
+    profile: Optional[BrowserProfile] = None
     _page_wait_time: int = 120
     _element_wait_time: int = 120
+    _instruction_wait_time: int = 15
     domain: str = "news.google.com"
     site_url: str = "https://news.google.com/home?hl=en-CA&gl=CA&ceid=CA%3Aen"
+    direct_search: bool = True
     _search_bar_css_locator: str = "input[class='Ax4B8 ZAGvjd']"
     _news_css_locator: str = "div[class='UW0SDc']"
     _news_detail_xpath_locator: str = ".//div[@class='IL9Cne']/a[@class='JtKRv']"
+    _news_card_css_locator: str = "article"
+    _news_publisher_css_locator: str = "div[class='vr1PYe']"
+    _news_time_css_locator: str = "time"
+    _harvest_cards_script: str = """
+        const [titleXpath, cardCss, publisherCss, timeCss] = arguments;
+        const links = document.evaluate(titleXpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+        const cards = [];
+        for (let i = 0; i < links.snapshotLength; i++) {
+            const link = links.snapshotItem(i);
+            const card = link.closest(cardCss) || link.parentElement;
+            const publisher = card.querySelector(publisherCss);
+            const time = card.querySelector(timeCss);
+            cards.push({
+                title: link.innerText,
+                href: link.href,
+                publisher: publisher ? publisher.innerText : null,
+                published: time ? time.innerText : null,
+                published_at: time ? time.getAttribute('datetime') : null
+            });
+        }
+        return cards;
+    """
     site_config: SiteConfig = SiteConfig()
+    parser_config: NewsParserConfig = NewsParserConfig()
     
-    def __init__(self) -> None:
+    def __init__(self, workers: int = 1, fetch_mode: str = FetchMode.BROWSER, decode_urls: bool = True,
+                 cache: Optional[HtmlCache] = None, use_cache: bool = True, index: Optional[ArticleIndex] = None,
+                 planner: Optional[FetchPlanner] = None, profile: Optional[BrowserProfile] = None,
+                 detector: Optional[InterstitialDetector] = None, scheduler: Optional[FetchScheduler] = None,
+                 site_url: str = None, domain: str = None, recorder: Optional[WarcRecorder] = None,
+                 capture: Optional[HtmlCapture] = None, site_config: Optional[SiteConfig] = None) -> None:
+        """Open the browser used for searching. With <workers> greater
+        than 1, articles are visited by a pool of that many browsers.
+        With <fetch_mode> set to FetchMode.HTTP_FIRST, articles are 
+        downloaded over HTTP and only fall back to the browser when needed.
+        With <decode_urls>, Google News links are decoded into their publisher
+        URLs up front instead of waiting for the browser to be redirected.
+        With <use_cache>, page sources are read from and saved to <cache>
+        (the default HtmlCache if not given).
+        With an <index> of seen articles, articles fetched in earlier runs
+        are skipped and only their new theme/keyword associations are recorded.
+        With a <planner>, articles from sites that can't be parsed are 
+        archived only or skipped before any browser visit.
+        The browser is started with <profile> (DEFAULT_PROFILE if not given),
+        e.g. PERFORMANCE_PROFILE for a headless browser that only loads
+        what parsing needs.
+        Consent walls, bot checks and paywalls are recognized by <detector> 
+        (the default InterstitialDetector if not given), so that blocked 
+        articles are given up on quickly.
+        Browser visits are rate limited, retried and stopped for failing 
+        publishers by <scheduler> (the default FetchScheduler if not given).
+        <site_url> and <domain> replace the Google News home page and domain,
+        e.g. to scrape from a ReplayServer (see ReplayServer.get_url and get_domain).
+        With a <recorder>, the search results pages, Google News redirects
+        and article pages (including cached and downloaded ones) are recorded for replay.
+        Page sources are compressed into the articles, and stripped or
+        spooled to disk, as set by <capture> (HtmlCapture() if not given).
+        A <site_config> replaces the default SiteConfig for this scraper and
+        its scheduler, planner and cache, e.g. ReplayServer.get_site_config.
+        """
         self._logger = setup_logger(self.__class__.__name__)
+        if site_url is not None:
+            self.site_url = site_url
+        if domain is not None:
+            self.domain = domain
+        self.recorder = recorder
+        self.capture = capture if capture is not None else HtmlCapture()
+        self.profile = profile if profile is not None else DEFAULT_PROFILE
+        self.detector = detector if detector is not None else InterstitialDetector()
+        self.scheduler = scheduler if scheduler is not None else FetchScheduler()
         self._logger.info('Opening Edge browser')
-        self._driver = WebDriver()
+        self._driver = self.profile.open_browser()
         self._wait_until(self._page_wait_time)
+        self.workers = workers
+        self.fetch_mode = fetch_mode
+        self.decode_urls = decode_urls
+        self._pool = None
+        self._http_fetcher = None
+        self._url_decoder = None
+        self._cache = (cache if cache is not None else HtmlCache()) if use_cache else None
+        self._owns_cache = use_cache and cache is None
+        self.index = index
+        self.planner = planner
+        self._search_cards = {}
+        if site_config is not None:
+            self.site_config = site_config
+            for component in (self.scheduler, self.planner, self._cache):
+                if component is not None:
+                    component.site_config = site_config
+        self.scheduler.redirect_domains.add(self.site_config._get_site_domain(self.site_url))
 
     def _open_browser(self) -> None:
         try:
             self._driver.current_url
         except InvalidSessionIdException:
             self._logger.info('Opening Edge browser')
-            self._driver = WebDriver()
+            self._driver = self.profile.open_browser()
             self._wait_until(self._page_wait_time)
 
+    def _restart_browser(self) -> None:
+        """Quit the current (possibly crashed) browser session and
+        open a new one.
+        """
+        self._logger.info('Restarting Edge browser')
+        try:
+            self._driver.quit()
+        except WebDriverException:
+            pass
+        self._driver = self.profile.open_browser()
+        self._search_bar = None
+        self._wait_until(self._page_wait_time)
+
+    def _get_pool(self) -> BrowserPool:
+        """Return the pool of browsers used for visiting articles.
+        This scraper's own browser is the pool's first worker.
+        """
+        if self._pool is None:
+            self._pool = BrowserPool(self._new_worker, self.workers, seed_workers=[self])
+        return self._pool
+
+    def _new_worker(self) -> 'GoogleNewsScraper':
+        """Open another scraper for the browser pool. It shares this
+        scraper's HTML cache.
+        """
+        return GoogleNewsScraper(decode_urls=False, cache=self._cache, use_cache=self._cache is not None, profile=self.profile,
+                                 detector=self.detector, site_url=self.site_url, domain=self.domain, recorder=self.recorder,
+                                 capture=self.capture, site_config=self.site_config)
+
+    def _get_http_fetcher(self) -> HttpArticleFetcher:
+        """Return the HTTP client used for downloading articles
+        in FetchMode.HTTP_FIRST.
+        """
+        if self._http_fetcher is None:
+            self._http_fetcher = HttpArticleFetcher(browser_domains=[self.site_config._get_site_domain(self.site_url)], cache=self._cache,
+                                                      capture=self.capture, recorder=self.recorder)
+            self._http_fetcher.site_config = self.site_config
+        return self._http_fetcher
+
+    def _get_url_decoder(self) -> GoogleNewsUrlDecoder:
+        """Return the decoder of Google News article links.
+        """
+        if self._url_decoder is None:
+            self._url_decoder = GoogleNewsUrlDecoder()
+        return self._url_decoder
+
+    def _decode_article_urls(self, article_urls: List[str]) -> List[str]:
+        """Replace the Google News links in <article_urls> with their
+        publisher URLs where they can be decoded.
+        """
+        self._logger.info(f'Decoding {len(article_urls)} Google News article URLs')
+        decoded_urls = self._get_url_decoder().decode_all(article_urls)
+        for article_url, decoded_url in decoded_urls.items():
+            if article_url in self._search_cards:
+                self._search_cards[decoded_url] = self._search_cards[article_url]
+        return [decoded_urls.get(article_url, article_url) for article_url in article_urls]
+
     def _navigate_url(self, site_url: str = None) -> None:
         """Navigate to the URL <site_url> (Google News website by default).
-        Wait for the page until it completes loading.
+        Wait for the page until it completes loading, and get past a consent 
+        wall if there is one.
         """
         if site_url is None:
             self._logger.info(f'Navigating to the URL -> {self.site_url}')
-            self._driver.get(self.site_url)
-            self._wait_until(self._page_wait_time)
+            with get_metrics().time('navigation_seconds', page='home'):
+                self._driver.get(self.site_url)
+                self._wait_until(self._page_wait_time)
+            self.detector.resolve(self._driver, self.site_url)
         else:
             self._logger.info(f'Navigating to the URL -> {site_url}')
-            self._driver.get(site_url)
-            self._wait_until(self._page_wait_time)
+            with get_metrics().time('navigation_seconds', page='other'):
+                self._driver.get(site_url)
+                self._wait_until(self._page_wait_time)
+            self.detector.resolve(self._driver, site_url)
 
     def _navigate_article_url(self, article_url: str) -> None:
         """Navigate to the article URL <article_url>. 
         <article_url> is encoded with base64 under Google News domain name. 
         Wait specifically for the URL to change into its actual domain URL.
+        Raise a BlockedPageError as soon as the article turns out to be 
+        hidden behind a consent wall, bot check or paywall.
         """
         self._logger.info(f'Navigating to the Google news article URL -> {article_url}')
         self._driver.get(article_url)
         self._wait_until(self._page_wait_time)
 
-        self._logger.info(f'Waiting for the article URL domain to change from "{self.domain}" to its original domain')
-        self._wait_until_url_not_contain(self._element_wait_time, self.domain)
+        if self.domain in article_url:
+            self._logger.info(f'Waiting for the article URL domain to change from "{self.domain}" to its original domain')
+            self._wait_until_redirected(self._element_wait_time, self.domain)
+
+        outcome = self.detector.resolve(self._driver, article_url)
+        if outcome == InterstitialOutcome.CONSENT_ACCEPTED and self.domain in self._driver.current_url:
+            self._wait_until_redirected(self._element_wait_time, self.domain)
+            self.detector.resolve(self._driver, article_url)
 
     def _get_search_bar(self) -> None:
         """Get the search bar and save it for input.
@@ -93,19 +278,57 @@ class GoogleNewsScraper:
             self._logger.info(f'Searching for news articles with keyword {keyword}')
             self._wait_until_css_present(self._element_wait_time, self._news_css_locator)
 
-    def _get_news(self) -> List[WebElement]:
+    def _get_search_url(self, keyword: str) -> str:
+        """Return the URL of the Google News search results for <keyword>,
+        in the same language and region (hl, gl, ceid) as <site_url>, and
+        next to its page (so that a path prefix of <site_url> is kept).
+        """
+        site_url = urlparse(self.site_url)
+        params = [('q', keyword)] + [(name, value) for name, value in parse_qsl(site_url.query) if name in ('hl', 'gl', 'ceid')]
+        return f'{site_url.scheme}://{site_url.netloc}{site_url.path.rsplit("/", 1)[0]}/search?{urlencode(params)}'
+
+    def _search_keyword_directly(self, keyword: str) -> None:
+        """Navigate straight to the search results of <keyword>
+        instead of typing it in the search bar of the home page.
+        """
+        self._logger.info(f'Searching for news articles with keyword {keyword}')
+        self._navigate_url(self._get_search_url(keyword))
+        self._wait_until_css_present(self._element_wait_time, self._news_css_locator)
+
+    def _get_search_cards(self) -> List[SearchCard]:
+        """Harvest the title, URL, publisher and time of every article card 
+        on the search results page with a single script call, and resolve 
+        each card's site from its publisher.
+        """
         self._logger.info('Getting the searched articles information')
         self._wait_until_xpath_present(self._element_wait_time, self._news_detail_xpath_locator)
-        news = self._driver.find_elements(By.XPATH, self._news_detail_xpath_locator)
-        return news
-    
+        harvested_cards = self._driver.execute_script(
+            self._harvest_cards_script,
+            self._news_detail_xpath_locator,
+            self._news_card_css_locator,
+            self._news_publisher_css_locator,
+            self._news_time_css_locator
+        )
+        return [
+            SearchCard(
+                card['title'],
+                card['href'],
+                card['publisher'],
+                card['published'],
+                card['published_at'],
+                self.site_config.get_site_name_by_publisher(card['publisher']) if card['publisher'] else 'TBD'
+            )
+            for card in harvested_cards
+        ]
+
     def _get_waitor(self, second: int) -> WebDriverWait:
         return WebDriverWait(self._driver, second)
 
     def _wait_until(self, second: int) -> None:
         self._logger.info(f'Waiting for page to complete loading (maximum {second} seconds)')
+        ready_states = self.profile.get_ready_states()
         self._get_waitor(second).until(
-            lambda driver: driver.execute_script("return document.readyState") == "complete"
+            lambda driver: driver.execute_script("return document.readyState") in ready_states
         )
 
     def _wait_until_xpath_present(self, second: int, xpath: str) -> None:
@@ -126,7 +349,27 @@ class GoogleNewsScraper:
     def _wait_until_url_not_contain(self, second: int, keyword: str) -> None:
         self._get_waitor(second).until(EC.none_of(EC.url_contains(keyword)))
 
+    def _wait_until_redirected(self, second: int, keyword: str) -> None:
+        """Wait for the URL to not contain <keyword> anymore, or for
+        an interstitial to show up instead of the redirect.
+        """
+        with get_metrics().time('redirect_wait_seconds'):
+            self._get_waitor(second).until(
+                lambda driver: keyword not in driver.current_url or self.detector.detect(driver) is not None
+            )
+
     def finish(self) -> None:
+        if self._pool is not None:
+            self._pool.finish(keep=[self])
+            self._pool = None
+        if self._http_fetcher is not None:
+            self._http_fetcher.finish()
+            self._http_fetcher = None
+        if self._url_decoder is not None:
+            self._url_decoder.finish()
+            self._url_decoder = None
+        if self._cache is not None and self._owns_cache:
+            self._cache.finish()
         self._logger.info('Closing the browser')
         self._driver.quit()
     
@@ -134,51 +377,206 @@ class GoogleNewsScraper:
         """Scrape the links of all articles returned by searching for 
         keyword <keyword>. 
         """
+        metrics = get_metrics()
         self._open_browser()
-        self._navigate_url()
-        self._get_search_bar()
-        self._search_keyword(keyword)
+        with metrics.time('search_seconds'):
+            if self.direct_search:
+                self._search_keyword_directly(keyword)
+            else:
+                self._navigate_url()
+                self._get_search_bar()
+                self._search_keyword(keyword)
 
-        self._logger.info(f'Getting the URLs of articles searched using keyword "{keyword}"')
+            self._logger.info(f'Getting the URLs of articles searched using keyword "{keyword}"')
 
-        article_urls = {new.text: new.get_attribute('href') for new in self._get_news() if new.text != ''}
+            search_cards = [card for card in self._get_search_cards() if card.title != '']
+            if self.recorder is not None:
+                self._record_search_page(keyword)
+        metrics.increment('search_results_total', len(search_cards))
+        self._search_cards.update({card.url: card for card in search_cards})
+        article_urls = {card.title: card.url for card in search_cards}
 
         return article_urls if return_dict else list(article_urls.values())
     
+    def _record_search_page(self, keyword: str) -> None:
+        """Record the search results page of <keyword>, and the redirect
+        to it from its search URL if Google News changed the URL.
+        """
+        search_url = self._get_search_url(keyword)
+        if self.direct_search and self._driver.current_url != search_url:
+            self.recorder.record_redirect(search_url, self._driver.current_url)
+        self.recorder.record_page(self._driver.current_url, self._driver.page_source)
+
+    def _get_cached_article(self, article_url: str) -> Optional[Article]:
+        """Return the article of <article_url> from the HTML cache, or None
+        if it isn't cached (or the cache isn't used).
+        """
+        cached = self._cache.get(article_url) if self._cache is not None else None
+        if cached is None:
+            return None
+        self._logger.info(f'Reading the article from the HTML cache -> {article_url}')
+        get_metrics().increment('html_cache_hits_total')
+        if self.recorder is not None:
+            self.recorder.record_article(article_url, cached.url, cached.html_content)
+        return self.capture.to_article(cached.site, cached.url, cached.html_content, cached.fetched_at)
+
     def _get_article_info(self, article_url: str) -> Article:
         """Get the news site name, original domain's URL, and
-        the article's HTML content. 
+        the article's HTML content with the browser. The HTML cache
+        was already checked for it (see _get_articles).
         """
+        metrics = get_metrics()
         self._open_browser()
         self._navigate_article_url(article_url)
 
         self._logger.info(f'Getting the article\'s site name, domain URL, and HTML content from {article_url}')
         
         site = self.site_config.get_site_name(self._driver.current_url)
+        if self.profile.wait_for_instructions:
+            self._wait_for_instruction_elements(site)
         url = self._driver.current_url
-        html_content = self._driver.page_source
+        with metrics.time('page_source_seconds'):
+            html_content = self._driver.page_source
+        metrics.observe('page_source_bytes', len(html_content))
+
+        if self.recorder is not None:
+            self.recorder.record_article(article_url, url, html_content)
+
+        if self._cache is not None:
+            self._cache.put(url, site, html_content)
+            if url != article_url:
+                self._cache.put(article_url, site, html_content, resolved_url=url)
 
-        return Article(site, url, html_content)
+        return self.capture.to_article(site, url, html_content)
     
+    def _wait_for_instruction_elements(self, site: str) -> None:
+        """Wait for the elements that the parser instructions of <site> 
+        need to be present. If they don't show up in time (e.g. the site's 
+        layout changed), the page is taken as it is.
+        """
+        if not self.parser_config.has_instructions(site) or self.parser_config.get_plan(site).wait_xpath is None:
+            return
+        self._logger.info(f'Waiting for the elements parsed from {site} articles (maximum {self._instruction_wait_time} seconds)')
+        try:
+            self._wait_until_xpath_present(self._instruction_wait_time, self.parser_config.get_plan(site).wait_xpath)
+        except TimeoutException:
+            self._logger.warning(f'Elements parsed from {site} articles are not present, using the page as it is')
+
+    def _plan_articles(self, article_urls: List[str]) -> Tuple[List[str], List[str]]:
+        """Return the URLs of <article_urls> worth fetching, and those 
+        among them that are fetched for archiving only.
+        """
+        if self.planner is None:
+            return article_urls, []
+        publisher_sites = {article_url: self._search_cards[article_url].site for article_url in article_urls if article_url in self._search_cards}
+        fetch_plan = self.planner.plan(article_urls, publisher_sites, archivable=self._cache is not None or self.recorder is not None)
+        return fetch_plan.fetch_urls, fetch_plan.archive_urls
+
+    def _get_publishers(self, article_urls: List[str]) -> Dict[str, str]:
+        """Return the publisher (site, or publisher name if the site is unknown)
+        shown on the search results page of each of <article_urls> that is
+        still a Google News link, so that it is rate limited under its publisher.
+        """
+        publishers = {}
+        for article_url in article_urls:
+            card = self._search_cards.get(article_url)
+            if card is not None and self.domain in article_url:
+                publisher = card.site if card.site != 'TBD' else card.publisher
+                if publisher is not None:
+                    publishers[article_url] = publisher
+        return publishers
+
+    def _get_articles(self, article_urls: List[str]) -> Generator[Tuple[str, Article], None, None]:
+        """Scrape the article info from each of <article_urls>, using the
+        configured fetch mode and browser pool. Articles that couldn't
+        be scraped are left out. Cached articles are read first, without
+        waiting for their domain's rate limit.
+        """
+        if self._cache is not None:
+            uncached_urls = []
+            for article_url in article_urls:
+                article = self._get_cached_article(article_url)
+                if article is None:
+                    uncached_urls.append(article_url)
+                    continue
+                yield article_url, article
+            article_urls = uncached_urls
+
+        if self.fetch_mode == FetchMode.HTTP_FIRST:
+            browser_urls = []
+            for article_url, article in self._get_http_fetcher().map_articles(article_urls):
+                if article is None:
+                    browser_urls.append(article_url)
+                    continue
+                self._logger.info(f'Article info successfully downloaded from {article_url} \n')
+                yield article_url, article
+            article_urls = browser_urls
+
+        visit = self._get_pool().visit if self.workers > 1 else self._get_article_info
+        for article_url, article in self.scheduler.run(article_urls, visit, self.workers, self._get_publishers(article_urls)):
+            if article is not None:
+                self._logger.info(f'Article info successfully scraped from {article_url} \n')
+                yield article_url, article
+
     def get_search_articles(self, theme: Theme, keyword: str, urls: List[str] = None) -> Generator[SearchResult]:
         """For each <theme>, scrape the results from articles returned by Google-searching 
         the keyword <keyword>. If a list of article URLs <urls> is provided, then scrape
         those articles only. 
         """
         article_urls = self._scrape_article_urls(keyword) if urls is None else urls
-        url_parsed = {article_url: False for article_url in article_urls}     
+        if self.decode_urls:
+            article_urls = self._decode_article_urls(article_urls)
 
-        try:  
-            for article_url in article_urls:
-                article = self._get_article_info(article_url) 
-                url_parsed[article_url] = True
+        if self.index is not None:
+            self.index.record_search(article_urls, theme, keyword)
+            article_urls = self.index.filter_unfetched(article_urls)
+        article_urls, archive_urls = self._plan_articles(article_urls)
 
-                self._logger.info(f'Article info successfully scraped from {article_url} \n')
+        for article_url, article in self._get_articles(article_urls):
+            if article_url in archive_urls:  # Not marked as fetched, so that it is parsed once it can be
+                continue
+            if self.index is not None:
+                self.index.mark_fetched(article_url, article)
+            yield SearchResult(keyword, theme, article)
+
+    def search_keywords(self, keyword_matrix: Dict[Theme, List[str]]) -> Dict[str, List[Tuple[Theme, str]]]:
+        """Search for every keyword of every theme in <keyword_matrix> 
+        (e.g. {Theme.DEMAND: [...], Theme.SUPPLY: [...]}) in one browser
+        session. Return each article URL found with the (theme, keyword)
+        pairs whose search returned it.
+        """
+        url_searches = {}
+        for theme, keywords in keyword_matrix.items():
+            for keyword in keywords:
+                article_urls = self._scrape_article_urls(keyword)
+                if self.decode_urls:
+                    article_urls = self._decode_article_urls(article_urls)
+                if self.index is not None:
+                    self.index.record_search(article_urls, theme, keyword)
+                for article_url in article_urls:
+                    searches = url_searches.setdefault(article_url, [])
+                    if (theme, keyword) not in searches:
+                        searches.append((theme, keyword))
+
+        self._logger.info(f'Found {len(url_searches)} distinct articles from {sum(map(len, keyword_matrix.values()))} keywords')
+        return url_searches
+
+    def get_batch_search_articles(self, keyword_matrix: Dict[Theme, List[str]]) -> Generator[SearchResult]:
+        """Search for every keyword of every theme in <keyword_matrix>, then 
+        scrape each distinct article once. Yield a search result for every 
+        (theme, keyword) pair that returned the article.
+        """
+        url_searches = self.search_keywords(keyword_matrix)
+        article_urls = list(url_searches) if self.index is None else self.index.filter_unfetched(list(url_searches))
+        article_urls, archive_urls = self._plan_articles(article_urls)
+
+        for article_url, article in self._get_articles(article_urls):
+            if article_url in archive_urls:  # Not marked as fetched, so that it is parsed once it can be
+                continue
+            if self.index is not None:
+                self.index.mark_fetched(article_url, article)
+            for theme, keyword in url_searches[article_url]:
                 yield SearchResult(keyword, theme, article)
-        except TimeoutError or RuntimeError or ConnectionError:
-            self._logger.error('Timeout when parsing an article\'s info. Trying again to parse articles from remaining URLs')
-            remaining_urls = [article_url for article_url, parsed in url_parsed.items() if not parsed]
-            self.get_search_articles(theme, keyword, remaining_urls)
 
 
 
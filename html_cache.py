@@ -0,0 +1,221 @@
+from logging import Logger
+from threading import Lock, get_ident
+from dataclasses import dataclass
+from typing import Dict, Optional
+from scraper.config.news_site_config import SiteConfig
+from scraper.utils import setup_logger
+
+import os
+import time
+import hashlib
+import sqlite3
+import zstandard
+
+
+@dataclass
+class CachedPage:
+    """A page source stored in the HTML cache. <url> is the
+    resolved URL of the page.
+    """
+    url: str
+    site: str
+    html_content: str
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fresh: bool = True
+
+
+@dataclass
+class HtmlCache:
+    """An on-disk cache of article page sources keyed by their resolved URL.
+
+    Page sources are stored once per content hash as zstd-compressed blobs,
+    so URLs with identical content share a blob. Entries expire after the
+    TTL of their domain, counted from their last revalidation (fetched_at
+    stays the time the page was downloaded), keep their ETag/Last-Modified
+    for conditional revalidation, and the least recently used ones are
+    evicted once the blobs exceed <max_bytes>.
+    """
+    _logger: Logger
+    _lock: Lock
+    _connection: sqlite3.Connection
+    _compressor: zstandard.ZstdCompressor
+    _decompressor: zstandard.ZstdDecompressor
+    cache_dir: str = os.path.join('data', 'cache', 'html')
+    max_bytes: int = 2 * 1024 ** 3
+    default_ttl: float = 24 * 60 * 60
+    domain_ttls: Dict[str, float] = None
+    site_config: SiteConfig = SiteConfig()
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = 2 * 1024 ** 3, default_ttl: float = 24 * 60 * 60,
+                 domain_ttls: Dict[str, float] = None, compression_level: int = 10) -> None:
+        """Open the cache at <cache_dir>. Entries from the domains in
+        <domain_ttls> expire after their own TTL (in seconds) instead
+        of <default_ttl>.
+        """
+        self._logger = setup_logger(self.__class__.__name__)
+        self._lock = Lock()
+        if cache_dir is not None:
+            self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.domain_ttls = domain_ttls or {}
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._connection = sqlite3.connect(os.path.join(self.cache_dir, 'index.sqlite'), check_same_thread=False)
+        self._connection.executescript(
+            'CREATE TABLE IF NOT EXISTS pages ('
+            'url TEXT PRIMARY KEY, '
+            'resolved_url TEXT NOT NULL, '
+            'content_hash TEXT NOT NULL, '
+            'site TEXT NOT NULL, '
+            'fetched_at REAL NOT NULL, '
+            'last_access REAL NOT NULL, '
+            'etag TEXT, '
+            'last_modified TEXT, '
+            'validated_at REAL);'
+            'CREATE TABLE IF NOT EXISTS blobs ('
+            'content_hash TEXT PRIMARY KEY, '
+            'size INTEGER NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS pages_last_access ON pages (last_access);'
+            'CREATE INDEX IF NOT EXISTS pages_content_hash ON pages (content_hash);'
+        )
+        if 'validated_at' not in {column[1] for column in self._connection.execute('PRAGMA table_info(pages)')}:
+            self._connection.execute('ALTER TABLE pages ADD COLUMN validated_at REAL')  # Caches created before revalidation times were kept
+        self._connection.commit()
+
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.cache_dir, content_hash[:2], f'{content_hash}.zst')
+
+    def _get_ttl(self, url: str) -> float:
+        """Return the TTL (in seconds) of cached pages from the domain of <url>.
+        """
+        return self.domain_ttls.get(self.site_config._get_site_domain(url), self.default_ttl)
+
+    def get(self, url: str, allow_stale: bool = False) -> Optional[CachedPage]:
+        """Return the cached page of <url>, or None if it isn't cached.
+        An expired page is only returned with <allow_stale> (marked as
+        not fresh), so that it can be revalidated with its ETag/Last-Modified.
+        """
+        with self._lock:
+            entry = self._connection.execute(
+                'SELECT resolved_url, content_hash, site, fetched_at, validated_at, etag, last_modified FROM pages WHERE url = ?', (url,)
+            ).fetchone()
+        if entry is None:
+            return None
+
+        resolved_url, content_hash, site, fetched_at, validated_at, etag, last_modified = entry
+        fresh = time.time() - (validated_at if validated_at is not None else fetched_at) < self._get_ttl(resolved_url)
+        if not fresh and not allow_stale:
+            return None
+
+        try:
+            with open(self._blob_path(content_hash), 'rb') as blob:
+                html_content = self._decompressor.decompress(blob.read()).decode('utf-8')
+        except (OSError, zstandard.ZstdError):
+            self._logger.error(f'Cached page of {url} is missing or corrupted')
+            self.remove(url)
+            return None
+
+        with self._lock:
+            self._connection.execute('UPDATE pages SET last_access = ? WHERE url = ?', (time.time(), url))
+            self._connection.commit()
+        return CachedPage(resolved_url, site, html_content, fetched_at, etag, last_modified, fresh)
+
+    def put(self, url: str, site: str, html_content: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None, resolved_url: Optional[str] = None) -> None:
+        """Cache the page source <html_content> of <url>. If <url> was
+        redirected, <resolved_url> is the URL the page ended up at.
+        """
+        resolved_url = resolved_url if resolved_url is not None else url
+        content = html_content.encode('utf-8')
+        content_hash = hashlib.sha256(content).hexdigest()
+        blob_path = self._blob_path(content_hash)
+
+        with self._lock:
+            known_blob = self._connection.execute('SELECT 1 FROM blobs WHERE content_hash = ?', (content_hash,)).fetchone()
+        if known_blob is None:
+            compressed = self._compressor.compress(content)
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            temporary_path = f'{blob_path}.{os.getpid()}.{get_ident()}.tmp'
+            with open(temporary_path, 'wb') as blob:
+                blob.write(compressed)
+            os.replace(temporary_path, blob_path)
+
+        now = time.time()
+        with self._lock:
+            if known_blob is None:
+                self._connection.execute('INSERT OR REPLACE INTO blobs (content_hash, size) VALUES (?, ?)', (content_hash, len(compressed)))
+            previous = self._connection.execute('SELECT content_hash FROM pages WHERE url = ?', (url,)).fetchone()
+            self._connection.execute(
+                'INSERT OR REPLACE INTO pages (url, resolved_url, content_hash, site, fetched_at, last_access, etag, last_modified, validated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, resolved_url, content_hash, site, now, now, etag, last_modified, now)
+            )
+            if previous is not None and previous[0] != content_hash:
+                self._delete_unreferenced_blob(previous[0])
+            self._connection.commit()
+        self._evict()
+
+    def touch(self, url: str) -> None:
+        """Mark the cached page of <url> as validated now (e.g. after the
+        server confirmed that it hasn't been modified), which restarts its
+        TTL but keeps the time it was downloaded.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute('UPDATE pages SET validated_at = ?, last_access = ? WHERE url = ?', (now, now, url))
+            self._connection.commit()
+
+    def remove(self, url: str) -> None:
+        with self._lock:
+            entry = self._connection.execute('SELECT content_hash FROM pages WHERE url = ?', (url,)).fetchone()
+            self._connection.execute('DELETE FROM pages WHERE url = ?', (url,))
+            if entry is not None:
+                self._delete_unreferenced_blob(entry[0])
+            self._connection.commit()
+
+    def _delete_unreferenced_blob(self, content_hash: str) -> None:
+        """Delete the blob <content_hash> if no cached page refers to it anymore.
+        Must be called while holding the lock.
+        """
+        if self._connection.execute('SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1', (content_hash,)).fetchone() is None:
+            self._connection.execute('DELETE FROM blobs WHERE content_hash = ?', (content_hash,))
+            try:
+                os.remove(self._blob_path(content_hash))
+            except FileNotFoundError:
+                pass
+
+    def size(self) -> int:
+        """Return the total size (in bytes) of the compressed blobs.
+        """
+        with self._lock:
+            return self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM blobs').fetchone()[0]
+
+    def _evict(self) -> None:
+        """Evict the least recently used pages until the blobs fit in <max_bytes>.
+        """
+        total_size = self.size()
+        if total_size <= self.max_bytes:
+            return
+
+        with self._lock:
+            entries = self._connection.execute('SELECT url, content_hash FROM pages ORDER BY last_access').fetchall()
+            evicted = 0
+            for url, content_hash in entries:
+                if total_size <= self.max_bytes:
+                    break
+                self._connection.execute('DELETE FROM pages WHERE url = ?', (url,))
+                blob_size = self._connection.execute('SELECT size FROM blobs WHERE content_hash = ?', (content_hash,)).fetchone()
+                self._delete_unreferenced_blob(content_hash)
+                if blob_size is not None and self._connection.execute('SELECT 1 FROM blobs WHERE content_hash = ?', (content_hash,)).fetchone() is None:
+                    total_size -= blob_size[0]
+                evicted += 1
+            self._connection.commit()
+        self._logger.info(f'Evicted {evicted} least recently used pages from the HTML cache')
+
+    def finish(self) -> None:
+        self._connection.close()
@@ -0,0 +1,106 @@
+from threading import Lock
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Tuple
+from scraper.config.metadata import Article, compress_html
+
+import os
+import re
+import mmap
+import tempfile
+
+
+_SCRIPT_PATTERN = re.compile(r'<script\b(?![^>]*ld\+json)[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+_STYLE_PATTERN = re.compile(r'<style\b[^>]*>.*?</style\s*>', re.IGNORECASE | re.DOTALL)
+_SVG_PATTERN = re.compile(r'<svg\b([^>]*)>.*?</svg\s*>', re.IGNORECASE | re.DOTALL)
+
+
+def strip_html(html_content: str) -> str:
+    """Remove the scripts (except JSON-LD metadata) and styles of <html_content>,
+    and empty its inline SVGs. The <svg> elements themselves are kept, since
+    parsing instructions may locate values next to an icon.
+    """
+    html_content = _SCRIPT_PATTERN.sub('', html_content)
+    html_content = _STYLE_PATTERN.sub('', html_content)
+    return _SVG_PATTERN.sub(r'<svg\1></svg>', html_content)
+
+
+@dataclass
+class HtmlSpool:
+    """An append-only file of compressed page sources, read back through
+    a memory map so that they stay out of the Python heap.
+
+    The file is a temporary one (removed by close()) unless <path> is
+    given. Articles spooled to it can't be read once it is closed.
+    """
+    _lock: Lock
+    _file: BinaryIO
+    _map: Optional[mmap.mmap] = None
+    _owns_file: bool = True
+    path: str = None
+    size: int = 0
+
+    def __init__(self, path: str = None) -> None:
+        self._lock = Lock()
+        self._map = None
+        self._owns_file = path is None
+        if path is None:
+            descriptor, path = tempfile.mkstemp(prefix='html-', suffix='.spool')
+            os.close(descriptor)
+        self.path = path
+        self._file = open(path, 'w+b')
+        self.size = 0
+
+    def append(self, data: bytes) -> Tuple[int, int]:
+        """Append <data> and return its (offset, length) in the spool.
+        """
+        with self._lock:
+            offset = self.size
+            self._file.seek(offset)
+            self._file.write(data)
+            self.size += len(data)
+        return offset, len(data)
+
+    def read(self, offset: int, length: int) -> bytes:
+        with self._lock:
+            if self._map is None or len(self._map) < offset + length:
+                self._file.flush()
+                if self._map is not None:
+                    self._map.close()
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map[offset:offset + length]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.close()
+        if self._owns_file:
+            os.remove(self.path)
+
+
+@dataclass
+class HtmlCapture:
+    """How the page sources of scraped articles are kept until they are parsed.
+
+    Page sources are compressed at <compression_level>, stripped of their
+    scripts, styles and inline SVG drawings first with <strip>, and
+    spilled to <spool> instead of memory if given.
+    """
+    strip: bool = False
+    spool: Optional[HtmlSpool] = None
+    compression_level: int = 3
+
+    def __init__(self, strip: bool = False, spool: Optional[HtmlSpool] = None, compression_level: int = 3) -> None:
+        self.strip = strip
+        self.spool = spool
+        self.compression_level = compression_level
+
+    def to_article(self, site: str, url: str, html_content: str, fetched_at: Optional[float] = None) -> Article:
+        """Return the article at <url> from <site> with the page source <html_content>,
+        downloaded at <fetched_at> (now if not given).
+        """
+        if self.strip:
+            html_content = strip_html(html_content)
+        compressed_html = compress_html(html_content, self.compression_level)
+        return Article(site, url, compressed_html=compressed_html, spool=self.spool, fetched_at=fetched_at)
@@ -0,0 +1,175 @@
+from logging import Logger
+from threading import Lock
+from dataclasses import dataclass
+from typing import Generator, List, Optional, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from scraper.config.metadata import Article
+from scraper.config.news_site_config import SiteConfig
+from scraper.news.html_cache import HtmlCache
+from scraper.news.html_capture import HtmlCapture
+from scraper.news.warc_recorder import WarcRecorder
+from scraper.utils import setup_logger
+
+import re
+import httpx
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+_INVISIBLE_BLOCK_PATTERN = re.compile(r'<(script|style|noscript|template|svg)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+_TAG_PATTERN = re.compile(r'<[^>]+>')
+_WHITESPACE_PATTERN = re.compile(r'\s+')
+_JS_REQUIRED_PATTERN = re.compile(r'(enable|requires?|turn on)\s+javascript', re.IGNORECASE)
+_EMPTY_APP_ROOT_PATTERN = re.compile(r'<div[^>]+id=["\'](root|app|__next|__nuxt)["\'][^>]*>\s*</div>', re.IGNORECASE)
+
+
+@dataclass
+class HttpArticleFetcher:
+    """Downloads article pages through a pooled keep-alive HTTP client
+    instead of a browser. Pages that need a browser (JS shells, bot
+    walls, or any page from a domain in <browser_domains>) aren't
+    returned, so the caller can fall back to the WebDriver path.
+    """
+    _client: httpx.Client
+    _logger: Logger
+    _lock: Lock
+    browser_domains: Set[str]
+    cache: Optional[HtmlCache] = None
+    capture: Optional[HtmlCapture] = None
+    recorder: Optional[WarcRecorder] = None
+    site_config: SiteConfig = SiteConfig()
+    max_connections: int = 16
+    timeout: float = 30.0
+    min_text_length: int = 500
+    user_agent: str = (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+        '(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36 Edg/124.0.0.0'
+    )
+
+    def __init__(self, browser_domains: List[str] = None, max_connections: int = 16, timeout: float = 30.0,
+                 cache: Optional[HtmlCache] = None, capture: Optional[HtmlCapture] = None,
+                 recorder: Optional[WarcRecorder] = None) -> None:
+        """Create the HTTP client. Articles from domains in <browser_domains>
+        (e.g. news.google.com redirect pages) always go through the browser.
+        Downloaded pages are stored in (and revalidated against) <cache>,
+        and kept in the articles as set by <capture>. With a <recorder>,
+        the returned articles are recorded for replay.
+        """
+        self.cache = cache
+        self.recorder = recorder
+        self.capture = capture if capture is not None else HtmlCapture()
+        self._logger = setup_logger(self.__class__.__name__)
+        self._lock = Lock()
+        self.browser_domains = set(browser_domains) if browser_domains is not None else {'news.google.com'}
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client = httpx.Client(
+            http2=HTTP2_AVAILABLE,
+            follow_redirects=True,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            headers={
+                'User-Agent': self.user_agent,
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-CA,en;q=0.9'
+            }
+        )
+
+    def _needs_browser(self, article_url: str) -> bool:
+        """Check if articles from the domain of <article_url> are
+        known to need the browser.
+        """
+        return self.site_config._get_site_domain(article_url) in self.browser_domains
+
+    def _use_browser_for(self, article_url: str, reason: str) -> None:
+        """Send all later articles from the domain of <article_url> to the browser.
+        """
+        domain = self.site_config._get_site_domain(article_url)
+        if domain is not None:
+            with self._lock:
+                self.browser_domains.add(domain)
+            self._logger.info(f'Using the browser for "{domain}" from now on ({reason})')
+
+    def _looks_like_js_shell(self, html_content: str) -> bool:
+        """Check if <html_content> is a page that only renders its
+        article with JavaScript. (E.g. an empty app root, a "please enable
+        JavaScript" notice, or almost no visible text.)
+        """
+        if _JS_REQUIRED_PATTERN.search(html_content) is not None and len(html_content) < 50_000:
+            return True
+        if _EMPTY_APP_ROOT_PATTERN.search(html_content) is not None:
+            return True
+        visible_text = _TAG_PATTERN.sub(' ', _INVISIBLE_BLOCK_PATTERN.sub(' ', html_content))
+        return len(_WHITESPACE_PATTERN.sub(' ', visible_text).strip()) < self.min_text_length
+
+    def _to_article(self, article_url: str, site: str, url: str, html_content: str, fetched_at: Optional[float] = None) -> Article:
+        if self.recorder is not None:
+            self.recorder.record_article(article_url, url, html_content)
+        return self.capture.to_article(site, url, html_content, fetched_at)
+
+    def fetch(self, article_url: str) -> Optional[Article]:
+        """Download the article at <article_url> over HTTP. Return None if
+        the article has to be scraped with the browser instead.
+        """
+        cached = self.cache.get(article_url, allow_stale=True) if self.cache is not None else None
+        if cached is not None and cached.fresh:
+            self._logger.info(f'Reading the article from the HTML cache -> {article_url}')
+            return self._to_article(article_url, cached.site, cached.url, cached.html_content, cached.fetched_at)
+        if self._needs_browser(article_url):
+            return None
+
+        headers = {}
+        if cached is not None and cached.etag is not None:
+            headers['If-None-Match'] = cached.etag
+        if cached is not None and cached.last_modified is not None:
+            headers['If-Modified-Since'] = cached.last_modified
+
+        self._logger.info(f'Downloading the article over HTTP -> {article_url}')
+        try:
+            response = self._client.get(article_url, headers=headers)
+        except httpx.HTTPError as error:
+            self._logger.error(f'HTTP download failed for {article_url} -> {error.__class__.__name__}')
+            return None
+
+        url = str(response.url)
+        if response.status_code == 304 and cached is not None:
+            self._logger.info(f'Cached article is still up to date -> {article_url}')
+            self.cache.touch(article_url)
+            return self._to_article(article_url, cached.site, cached.url, cached.html_content, cached.fetched_at)
+        if response.status_code in (401, 403, 429, 503):
+            self._use_browser_for(url, f'HTTP {response.status_code}')
+            return None
+        if response.status_code != 200 or 'html' not in response.headers.get('content-type', 'text/html'):
+            self._logger.error(f'Unexpected HTTP response {response.status_code} from {url}')
+            return None
+        if self._needs_browser(url):
+            return None
+        if self._looks_like_js_shell(response.text):
+            self._use_browser_for(url, 'page is rendered with JavaScript')
+            return None
+
+        site = self.site_config.get_site_name(url)
+        if self.cache is not None:
+            validators = (response.headers.get('etag'), response.headers.get('last-modified'))
+            self.cache.put(url, site, response.text, *validators)
+            if url != article_url:
+                self.cache.put(article_url, site, response.text, *validators, resolved_url=url)
+        return self._to_article(article_url, site, url, response.text)
+
+    def map_articles(self, article_urls: List[str]) -> Generator[Tuple[str, Optional[Article]], None, None]:
+        """Download all <article_urls> concurrently and yield each (URL, article)
+        pair as soon as it finishes. The article is None if it has to be
+        scraped with the browser instead.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_connections, thread_name_prefix=self.__class__.__name__) as executor:
+            futures = {executor.submit(self.fetch, article_url): article_url for article_url in article_urls}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def finish(self) -> None:
+        self._logger.info('Closing the HTTP client')
+        self._client.close()
@@ -0,0 +1,317 @@
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from dataclasses import dataclass
+from bisect import bisect_right
+from lxml import etree, html
+from parsel.csstranslator import css2xpath
+from scraper.config.metadata import Schema
+
+import re
+import math
+
+
+_NAMESPACES = {
+    're': 'http://exslt.org/regular-expressions',
+    'set': 'http://exslt.org/sets'
+}
+_DESCENDANT_TEXT = etree.XPath('descendant-or-self::*/text()', smart_strings=False)
+_XPATH_VALUE_STEP = re.compile(r'/+(text\(\)|@[\w:-]+)$')
+_CSS_PSEUDO_ELEMENT = re.compile(r'::(text|attr\([^)]*\))')
+_CONTAINER_STEP = re.compile(r'''^(?:descendant-or-self::|\.?//)([\w-]+)\[@([\w:-]+)\s*=\s*(['"])([^'"]*)\3\](?:/|$)''')
+_PRUNED_TAGS = ('script', 'style', 'noscript', 'link')
+_SKIPPED_SPAN_START = re.compile(rb'<(script|style|!--)')
+_SKIPPED_SPAN_ENDS = {b'script': b'</script', b'style': b'</style', b'!--': b'-->'}
+
+Container = Tuple[str, str, str]
+
+
+def _to_body(html_content: Union[str, bytes]) -> bytes:
+    if isinstance(html_content, bytes):
+        return html_content.strip().replace(b'\x00', b'') or b'<html/>'
+    return html_content.strip().replace('\x00', '').encode('utf-8') or b'<html/>'
+
+
+def _parse_body(body: Union[bytes, memoryview], parser: html.HTMLParser) -> etree._Element:
+    root = etree.fromstring(body, parser=parser)
+    if root is None:
+        root = etree.fromstring(b'<html/>', parser=parser)
+    return root
+
+
+def build_document(html_content: Union[str, bytes]) -> etree._Element:
+    """Parse <html_content> (a string, or its UTF-8 bytes) into the root
+    element that compiled queries are evaluated against (the same tree
+    parsel builds).
+    """
+    return _parse_body(_to_body(html_content), html.HTMLParser(recover=True, encoding='utf-8', huge_tree=True))
+
+
+def _get_skipped_spans(body: bytes, end: int) -> List[Tuple[int, int]]:
+    """Return the (start, end) offsets of the scripts, styles and comments
+    of <body> that start before <end>, in order. One that isn't closed
+    runs to the end of <body>.
+    """
+    spans = []
+    start = _SKIPPED_SPAN_START.search(body, 0, end)
+    while start is not None:
+        closing = _SKIPPED_SPAN_ENDS[start.group(1)]
+        span_end = body.find(closing, start.end())
+        span_end = len(body) if span_end < 0 else span_end + len(closing)
+        spans.append((start.start(), span_end))
+        start = _SKIPPED_SPAN_START.search(body, span_end, end)
+    return spans
+
+
+def _is_skipped(spans: List[Tuple[int, int]], position: int) -> bool:
+    index = bisect_right(spans, (position, math.inf)) - 1
+    return index >= 0 and position < spans[index][1]
+
+
+def _get_container_starts(body: bytes, container: Container) -> List[int]:
+    """Return the offsets in <body> of the start tags of the elements
+    matching <container>, scripts, styles and comments included. The
+    attribute value is searched for first, since it is rarer than the tag.
+    """
+    tag, attribute, value = (part.encode('utf-8') for part in container)
+    if value == b'':
+        return []
+    start_tag = re.compile(
+        rb'<' + re.escape(tag) + rb'(?=[\s/>])[^>]*?\s' + re.escape(attribute) + rb'''\s*=\s*(["'])''' + re.escape(value) + rb'\1',
+        re.IGNORECASE
+    )
+    starts = []
+    position = body.find(value)
+    while position >= 0:
+        tag_start = body.rfind(b'<', 0, position)
+        match = start_tag.match(body, tag_start) if tag_start >= 0 else None
+        if match is not None and match.end() == position + len(value) + 1:
+            starts.append(tag_start)
+        position = body.find(value, position + len(value))
+    return starts
+
+
+def _get_element_end(body: bytes, tag: str, first: int, last: int) -> Optional[int]:
+    """Return the offset in <body> right after the end tag of the first
+    <tag> element from <first> on that ends after <last> (the one starting
+    at <last>, or one around it), or None if it isn't closed. Tags inside
+    scripts, styles and comments aren't counted.
+    """
+    tags = re.compile(
+        rb'<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->|<(/?)' + re.escape(tag.encode('utf-8')) + rb'(?=[\s/>])[^>]*>',
+        re.IGNORECASE | re.DOTALL
+    )
+    depth = 0
+    for match in tags.finditer(body, first):
+        if match.group(1) is None:
+            continue
+        depth += -1 if match.group(1) == b'/' else 1
+        if depth == 0 and match.end() > last:
+            return match.end()
+    return None
+
+
+def _get_containers_end(body: bytes, containers: List[Container]) -> Optional[int]:
+    """Return the offset in <body> that the elements matching <containers>
+    all end before, or None if one of them isn't found or closed. Queries
+    select every match, so the page is kept up to the last element matching
+    each container (and any element of its tag around it), not the first.
+    Start tags inside scripts, styles and comments don't count.
+    """
+    container_starts = [_get_container_starts(body, container) for container in containers]
+    if [] in container_starts:
+        return None
+    spans = _get_skipped_spans(body, max(starts[-1] for starts in container_starts) + 1)
+    end = 0
+    for (tag, _, _), starts in zip(containers, container_starts):
+        starts = [start for start in starts if not _is_skipped(spans, start)]
+        container_end = _get_element_end(body, tag, starts[0], starts[-1]) if starts != [] else None
+        if container_end is None:
+            return None
+        end = max(end, container_end)
+    return end
+
+
+def build_pruned_document(html_content: Union[str, bytes], containers: Optional[List[Container]] = None) -> Tuple[etree._Element, bool]:
+    """Parse <html_content> like build_document, without comments, scripts
+    (except JSON-LD metadata), styles and linked resources. With the
+    <containers> (tag, attribute, value) that every query is anchored to,
+    the page is only parsed up to the end of the last element matching
+    any of them.
+    Return the root element, and whether the page was cut short.
+    """
+    body = _to_body(html_content)
+    end = _get_containers_end(body, containers) if containers else None
+    truncated = end is not None
+    if truncated:
+        body = memoryview(body)[:end]  # Parsed without copying the kept part
+
+    root = _parse_body(body, html.HTMLParser(recover=True, encoding='utf-8', huge_tree=True, remove_comments=True))
+    for element in list(root.iter(*_PRUNED_TAGS)):
+        if element.tag != 'script' or 'ld+json' not in element.get('type', ''):
+            element.drop_tree()
+    return root, truncated
+
+
+def _to_text(result) -> str:
+    """Return the string value of an XPath <result>, serializing
+    elements the same way parsel's getall() does.
+    """
+    if isinstance(result, etree._Element):
+        return etree.tostring(result, method='html', encoding='unicode', with_tail=False)
+    if isinstance(result, bool):
+        return '1' if result else '0'
+    return str(result)
+
+
+@dataclass
+class CompiledQuery:
+    """A parsing instruction query compiled into lxml XPath objects.
+
+    XPath queries that select text are returned as is, and XPath queries
+    that select elements return the text of those elements. CSS queries
+    are translated into XPath once, with the '*::text' suffix added if
+    they don't already select text.
+    """
+    query: str
+    syntax: str
+    element_xpath: Optional[str]
+    container: Optional[Container]
+    _xpath: etree.XPath
+    _select_descendant_text: bool
+
+    def __init__(self, query: str) -> None:
+        self.query = query
+        if '/' in query:
+            self.syntax = 'XPATH'
+            self._xpath = etree.XPath(query, namespaces=_NAMESPACES, smart_strings=False)
+            self._select_descendant_text = 'text()' not in query
+            self.element_xpath = _XPATH_VALUE_STEP.sub('', query)
+        else:
+            self.syntax = 'CSS'
+            css = query if '::text' in query else f'{query} *::text'
+            self._xpath = etree.XPath(css2xpath(css), namespaces=_NAMESPACES, smart_strings=False)
+            self._select_descendant_text = False
+            self.element_xpath = css2xpath(_CSS_PSEUDO_ELEMENT.sub('', query))
+        if 're:' in self.element_xpath or 'set:' in self.element_xpath:
+            self.element_xpath = None
+        self.container = self._get_container()
+
+    def _get_container(self) -> Optional[Container]:
+        """Return the (tag, attribute, value) of the element the query is
+        anchored to, e.g. ('div', 'class', 'article-body') for
+        "div[class='article-body'] p", if its first step is that simple.
+        """
+        match = _CONTAINER_STEP.match(self.element_xpath) if self.element_xpath is not None else None
+        return (match.group(1).lower(), match.group(2), match.group(4)) if match is not None else None
+
+    def evaluate(self, document: etree._Element) -> List[str]:
+        """Return the values selected by the query from <document>.
+        """
+        results = self._xpath(document)
+        if not isinstance(results, list):
+            return [_to_text(results)]
+        if self._select_descendant_text:
+            return [text for result in results if isinstance(result, etree._Element) for text in _DESCENDANT_TEXT(result)]
+        return [_to_text(result) for result in results]
+
+
+@dataclass
+class ColumnPlan:
+    """The compiled queries for parsing one column of an article.
+
+    For a single-value column, <queries> are fallbacks tried in order.
+    For a joined column, <queries> are fallback groups of queries whose
+    values are concatenated.
+
+    The plan counts how often each fallback is tried and how often it
+    succeeds. With <adaptive>, once <min_attempts> articles have been
+    parsed, fallbacks are tried in order of their successes instead of
+    their listed order. It is off by default: when several fallbacks
+    match, the value parsed would then depend on the articles parsed
+    before (and on the process that parsed them).
+    """
+    column: str
+    joined: bool
+    queries: Union[List[CompiledQuery], List[List[CompiledQuery]]]
+    syntax: str
+    attempts: List[int]
+    hits: List[int]
+    adaptive: bool = False
+    min_attempts: int = 20
+
+    def __init__(self, column: str, possible_queries: List, adaptive: bool = False) -> None:
+        self.column = column
+        self.adaptive = adaptive
+        self.joined = not isinstance(possible_queries[0], str)
+        if self.joined:
+            self.queries = [[CompiledQuery(query) for query in queries] for queries in possible_queries]
+            syntaxes = {query.syntax for queries in self.queries for query in queries}
+        else:
+            self.queries = [CompiledQuery(query) for query in possible_queries]
+            syntaxes = {query.syntax for query in self.queries}
+        self.syntax = syntaxes.pop() if len(syntaxes) == 1 else 'CSS and XPATH'
+        self.attempts = [0] * len(self.queries)
+        self.hits = [0] * len(self.queries)
+
+    def fallbacks(self) -> Iterator[Tuple[int, Union[CompiledQuery, List[CompiledQuery]]]]:
+        """Yield each fallback with its listed position, starting with 
+        the one that usually succeeds.
+        """
+        order = range(len(self.queries))
+        if self.adaptive and len(self.queries) > 1 and max(self.attempts) >= self.min_attempts:
+            order = sorted(order, key=lambda position: -self.hits[position])
+        for position in order:
+            yield position, self.queries[position]
+
+    def record(self, position: int, hit: bool) -> None:
+        """Count an attempt of the fallback at <position>.
+        """
+        self.attempts[position] += 1
+        self.hits[position] += hit
+
+
+@dataclass
+class InstructionPlan:
+    """The parsing instructions of a news site, compiled once
+    so that articles can be parsed without re-translating queries.
+    """
+    site: str
+    columns: Dict[str, ColumnPlan]
+    wait_xpath: Optional[str]
+    containers: Optional[List[Container]]
+
+    def __init__(self, site: str, instructions: Dict[str, List], adaptive: bool = False) -> None:
+        """With <adaptive>, the fallbacks of each column are reordered by
+        their successes (see ColumnPlan).
+        """
+        self.site = site
+        self.columns = {
+            column: ColumnPlan(column, possible_queries, adaptive)
+            for column, possible_queries in instructions.items() if possible_queries != []
+        }
+        self.wait_xpath = self._get_wait_xpath()
+        self.containers = self._get_containers()
+
+    def _get_wait_xpath(self, column: str = Schema.CONTENT) -> Optional[str]:
+        """Return an XPath matching the elements of any fallback of <column>,
+        which a browser can wait for instead of the full page load.
+        """
+        if column not in self.columns:
+            return None
+        column_plan = self.columns[column]
+        queries = [queries[0] for queries in column_plan.queries] if column_plan.joined else column_plan.queries
+        element_xpaths = [query.element_xpath for query in queries if query.element_xpath is not None]
+        return ' | '.join(element_xpaths) if element_xpaths != [] else None
+
+    def _get_containers(self) -> Optional[List[Container]]:
+        """Return the containers of every query of every column, which a
+        pruned parse can stop after. None if any query has no container.
+        """
+        containers = []
+        for column_plan in self.columns.values():
+            queries = [query for queries in column_plan.queries for query in queries] if column_plan.joined else column_plan.queries
+            for query in queries:
+                if query.container is None:
+                    return None
+                if query.container not in containers:
+                    containers.append(query.container)
+        return containers
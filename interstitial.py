@@ -0,0 +1,179 @@
+from logging import Logger
+from dataclasses import dataclass, field
+from typing import List, Optional
+from selenium.webdriver.edge.webdriver import WebDriver
+from selenium.common.exceptions import WebDriverException
+from scraper.utils import setup_logger
+from scraper.metrics import get_metrics
+
+import time
+
+
+@dataclass
+class InterstitialKind:
+    """A page shown by a site instead of (or on top of) the article.
+    """
+    CONSENT: str = 'consent'
+    BOT_CHECK: str = 'bot_check'
+    PAYWALL: str = 'paywall'
+
+
+@dataclass
+class InterstitialOutcome:
+    """How a visited page turned out after checking for interstitials.
+    """
+    CLEAR: str = 'clear'
+    CONSENT_ACCEPTED: str = 'consent_accepted'
+    OVERLAID: str = 'overlaid'
+    BLOCKED: str = 'blocked'
+
+
+@dataclass
+class InterstitialMarker:
+    """A recognizable interstitial. It is detected by a substring of the
+    page URL <url_marker>, of the page title <title_marker>, or by an
+    element matching <css> (one that is shown and has text, with
+    <visible>). Consent is given by clicking <accept_css>.
+    <blocking> interstitials hide the article, while the others are
+    overlays on top of an article that can still be parsed.
+    """
+    name: str
+    kind: str
+    blocking: bool
+    css: Optional[str] = None
+    url_marker: Optional[str] = None
+    title_marker: Optional[str] = None
+    accept_css: Optional[str] = None
+    visible: bool = False
+
+
+class BlockedPageError(Exception):
+    """The article at <url> is hidden behind the interstitial <marker>.
+    """
+
+    def __init__(self, url: str, marker: InterstitialMarker) -> None:
+        super().__init__(f'{url} is blocked by {marker.name} ({marker.kind})')
+        self.url = url
+        self.marker = marker
+
+
+_MARKERS = [
+    InterstitialMarker('Google consent', InterstitialKind.CONSENT, True, url_marker='consent.google.',
+                       accept_css="button[aria-label='Accept all'], form[action*='consent.google'] button[jsname='b3VHJd']"),
+    InterstitialMarker('Google unusual traffic', InterstitialKind.BOT_CHECK, True, url_marker='google.com/sorry/', css='form#captcha-form'),
+    InterstitialMarker('Cloudflare challenge', InterstitialKind.BOT_CHECK, True, url_marker='/cdn-cgi/challenge-platform/',
+                       title_marker='Just a moment...', css="#challenge-form, #challenge-stage, #cf-challenge-running"),
+    InterstitialMarker('Cloudflare block', InterstitialKind.BOT_CHECK, True, title_marker='Attention Required! | Cloudflare', css='#cf-error-details'),
+    InterstitialMarker('DataDome', InterstitialKind.BOT_CHECK, True, css="iframe[src*='captcha-delivery.com']"),
+    InterstitialMarker('PerimeterX', InterstitialKind.BOT_CHECK, True, css='#px-captcha'),
+    # Consent banners stay in the DOM, hidden, once consent was given
+    InterstitialMarker('OneTrust', InterstitialKind.CONSENT, False, css='#onetrust-banner-sdk', accept_css='#onetrust-accept-btn-handler',
+                       visible=True),
+    InterstitialMarker('Didomi', InterstitialKind.CONSENT, False, css='#didomi-notice', accept_css='#didomi-notice-agree-button', visible=True),
+    InterstitialMarker('Quantcast Choice', InterstitialKind.CONSENT, False, css='.qc-cmp2-container',
+                       accept_css=".qc-cmp2-summary-buttons button[mode='primary']", visible=True),
+    InterstitialMarker('TrustArc', InterstitialKind.CONSENT, False, css='#truste-consent-track, #truste-consent-content',
+                       accept_css='#truste-consent-button', visible=True),
+    InterstitialMarker('Cookiebot', InterstitialKind.CONSENT, False, css='#CybotCookiebotDialog',
+                       accept_css='#CybotCookiebotDialogBodyLevelButtonLevelOptinAllowAll, #CybotCookiebotDialogBodyButtonAccept', visible=True),
+    InterstitialMarker('Piano paywall', InterstitialKind.PAYWALL, True, css='.tp-modal .tp-iframe-wrapper, .tp-container-inner .tp-iframe-wrapper'),
+    InterstitialMarker('Poool paywall', InterstitialKind.PAYWALL, True, css='#poool-widget, .poool-widget'),
+    InterstitialMarker('Paywall', InterstitialKind.PAYWALL, True, css="#paywall, .paywall-overlay, [data-testid='paywall'], [data-component='paywall']",
+                       visible=True)  # Free pages often ship an empty or hidden paywall container
+]
+
+
+@dataclass
+class InterstitialDetector:
+    """Recognizes consent walls, bot checks and paywalls on the page a
+    browser is at, so that a blocked article is given up on within a few
+    seconds instead of waiting for a timeout.
+
+    Each check runs all markers in one script call. With <auto_accept>,
+    consent is accepted by clicking its accept button. A blocking
+    interstitial that doesn't go away within <poll_time> seconds (e.g. a
+    bot check that clears by itself) raises a BlockedPageError.
+    """
+    _logger: Logger
+    markers: List[InterstitialMarker] = field(default_factory=list)
+    auto_accept: bool = True
+    poll_time: float = 8.0
+    poll_interval: float = 0.5
+    _detect_script: str = """
+        const [url, title, selectors] = [window.location.href, document.title, arguments[0]];
+        const isShown = element => element.getClientRects().length > 0 && element.innerText.trim() !== '';
+        for (let i = 0; i < selectors.length; i++) {
+            const [urlMarker, titleMarker, css, visible] = selectors[i];
+            if ((urlMarker && url.includes(urlMarker)) || (titleMarker && title.includes(titleMarker))
+                    || (css && !visible && document.querySelector(css) !== null)
+                    || (css && visible && Array.from(document.querySelectorAll(css)).some(isShown))) {
+                return i;
+            }
+        }
+        return -1;
+    """
+    _accept_script: str = """
+        const button = document.querySelector(arguments[0]);
+        if (button === null) {
+            return false;
+        }
+        button.click();
+        return true;
+    """
+
+    def __init__(self, markers: List[InterstitialMarker] = None, auto_accept: bool = True,
+                 poll_time: float = 8.0, poll_interval: float = 0.5) -> None:
+        self._logger = setup_logger(self.__class__.__name__)
+        self.markers = markers if markers is not None else _MARKERS
+        self.auto_accept = auto_accept
+        self.poll_time = poll_time
+        self.poll_interval = poll_interval
+
+    def detect(self, driver: WebDriver) -> Optional[InterstitialMarker]:
+        """Return the marker of the interstitial <driver> is at, if any.
+        """
+        selectors = [[marker.url_marker, marker.title_marker, marker.css, marker.visible] for marker in self.markers]
+        try:
+            position = driver.execute_script(self._detect_script, selectors)
+        except WebDriverException:
+            return None
+        return self.markers[position] if position is not None and position >= 0 else None
+
+    def _wait_until_gone(self, driver: WebDriver, marker: InterstitialMarker) -> bool:
+        """Poll for up to <poll_time> seconds until <marker> is gone.
+        """
+        deadline = time.monotonic() + self.poll_time
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            if self.detect(driver) is not marker:
+                return True
+        return False
+
+    def _accept(self, driver: WebDriver, marker: InterstitialMarker) -> bool:
+        try:
+            return bool(driver.execute_script(self._accept_script, marker.accept_css))
+        except WebDriverException:
+            return False
+
+    def resolve(self, driver: WebDriver, url: str) -> str:
+        """Check the page <driver> is at (visited from <url>) for an interstitial
+        and return the InterstitialOutcome. Raise a BlockedPageError if the
+        article stays hidden behind it.
+        """
+        marker = self.detect(driver)
+        if marker is None:
+            return InterstitialOutcome.CLEAR
+
+        self._logger.info(f'Detected {marker.name} ({marker.kind}) on {url}')
+        get_metrics().increment('interstitials_total', kind=marker.kind, name=marker.name)
+        if self.auto_accept and marker.accept_css is not None and self._accept(driver, marker):
+            if self._wait_until_gone(driver, marker):
+                self._logger.info(f'Accepted {marker.name} on {url}')
+                return InterstitialOutcome.CONSENT_ACCEPTED
+
+        if not marker.blocking:
+            return InterstitialOutcome.OVERLAID
+        if marker.kind == InterstitialKind.BOT_CHECK and self._wait_until_gone(driver, marker):
+            self._logger.info(f'{marker.name} cleared on {url}')
+            return InterstitialOutcome.CLEAR
+        raise BlockedPageError(url, marker)
@@ -1,5 +1,14 @@
-from typing import List, Optional
-from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
+from dataclasses import dataclass, field
+
+import time
+import zstandard
+
+if TYPE_CHECKING:
+    from scraper.news.html_capture import HtmlSpool
+
+
+_HTML_COMPRESSION_LEVEL = 3
 
 
 @dataclass
@@ -12,13 +21,84 @@ class Theme:
     COMPONENT_PRICE: str = 'Component Price'
 
 
+@dataclass
+class FetchMode:
+    """A way of downloading the HTML content of articles.
+    """
+    BROWSER: str = 'browser'
+    HTTP_FIRST: str = 'http_first'
+
+
+def compress_html(html_content: str, level: int = _HTML_COMPRESSION_LEVEL) -> bytes:
+    """Return the page source <html_content> as zstd-compressed UTF-8 bytes.
+    """
+    return zstandard.ZstdCompressor(level=level).compress(html_content.encode('utf-8'))
+
+
+def decompress_html(compressed_html: bytes) -> bytes:
+    """Return the UTF-8 bytes of a page source compressed by compress_html.
+    """
+    return zstandard.ZstdDecompressor().decompress(compressed_html)
+
+
+@dataclass
+class ParseMode:
+    """A way of building the document that articles are parsed from.
+    """
+    FULL: str = 'full'
+    PRUNED: str = 'pruned'
+
+
 @dataclass
 class Article:
     """An article from a news site.
+
+    Its HTML content is kept as zstd-compressed UTF-8 bytes, in memory or
+    in an HtmlSpool file, and is only decompressed when it is read.
+    <fetched_at> is when the page was downloaded (seconds since the epoch).
     """
     site: str 
     url: str 
-    html_content: str
+    fetched_at: float = 0.0
+    _compressed_html: Optional[bytes] = field(default=None, repr=False)
+    _spool: Optional['HtmlSpool'] = field(default=None, repr=False)
+    _span: Tuple[int, int] = field(default=(0, 0), repr=False)
+
+    def __init__(self, site: str, url: str, html_content: str = '', compressed_html: Optional[bytes] = None,
+                 spool: Optional['HtmlSpool'] = None, fetched_at: Optional[float] = None) -> None:
+        """Keep the page source <html_content> of the article (or the page
+        source already compressed into <compressed_html>), in <spool> if given.
+        The page is taken as downloaded now unless <fetched_at> is given.
+        """
+        self.site = site
+        self.url = url
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        if compressed_html is None:
+            compressed_html = compress_html(html_content)
+        self._spool = spool
+        if spool is None:
+            self._compressed_html = compressed_html
+            self._span = (0, 0)
+        else:
+            self._compressed_html = None
+            self._span = spool.append(compressed_html)
+
+    @property
+    def compressed_html(self) -> bytes:
+        if self._spool is None:
+            return self._compressed_html
+        return self._spool.read(*self._span)
+
+    @property
+    def html_bytes(self) -> bytes:
+        """The UTF-8 bytes of the page source, which can be parsed
+        without decoding them into a string first.
+        """
+        return decompress_html(self.compressed_html)
+
+    @property
+    def html_content(self) -> str:
+        return self.html_bytes.decode('utf-8')
 
     def __print__(self) -> None:
         print(f"{self.site}: {self.url}")
@@ -26,6 +106,18 @@ class Article:
         print(self.html_content)
 
 
+@dataclass
+class SearchCard:
+    """An article card on the Google News search results page.
+    """
+    title: str
+    url: str
+    publisher: Optional[str] = None
+    published: Optional[str] = None
+    published_at: Optional[str] = None
+    site: str = 'TBD'
+
+
 @dataclass
 class SearchResult:
     """An article returned by Google search using keyword of a theme.
@@ -60,4 +152,6 @@ class Row:
     date: Optional[str] = None 
     author: Optional[str] = None 
     content: Optional[str] = None 
+    fetched_at: Optional[float] = None
+    duplicate_of: Optional[str] = None
     
\ No newline at end of file
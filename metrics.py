@@ -0,0 +1,228 @@
+from threading import Lock
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Tuple
+
+import os
+import json
+import time
+
+
+_SECONDS_BUCKETS = [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0]
+_BYTES_BUCKETS = [10_000, 50_000, 100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000, 10_000_000]
+_NULL_TIMER = nullcontext()
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class Histogram:
+    """Counts of observed values under each upper bound of <buckets>,
+    with the sum and count of all observed values.
+    """
+    buckets: List[float]
+    counts: List[int]
+    total: float = 0.0
+    count: int = 0
+
+    def __init__(self, buckets: List[float]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last count is for values above every bucket
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def merge(self, other: 'Histogram') -> None:
+        """Add the observations of <other>, which has the same buckets.
+        """
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.count += other.count
+
+
+@dataclass
+class NullMetrics:
+    """Metrics that record nothing, so that instrumentation costs
+    next to nothing while metrics aren't enabled.
+    """
+    enabled: bool = False
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        pass
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        pass
+
+    def time(self, name: str, **labels: str):
+        return _NULL_TIMER
+
+
+@dataclass
+class Metrics(NullMetrics):
+    """Counters and histograms of the scraping pipeline stages, exported
+    in the Prometheus text format or as JSON.
+
+    Metrics whose names end with "_seconds" or "_bytes" get the default
+    buckets of their unit, others need their buckets in <buckets>.
+    """
+    _lock: Lock = None
+    enabled: bool = True
+    prefix: str = 'news_scraper'
+    buckets: Dict[str, List[float]] = field(default_factory=dict)
+    counters: Dict[Tuple[str, Labels], float] = field(default_factory=dict)
+    histograms: Dict[Tuple[str, Labels], Histogram] = field(default_factory=dict)
+
+    def __init__(self, prefix: str = 'news_scraper', buckets: Dict[str, List[float]] = None) -> None:
+        self._lock = Lock()
+        self.enabled = True
+        self.prefix = prefix
+        self.buckets = buckets or {}
+        self.counters = {}
+        self.histograms = {}
+
+    def _get_buckets(self, name: str) -> List[float]:
+        if name in self.buckets:
+            return self.buckets[name]
+        return _BYTES_BUCKETS if name.endswith('_bytes') else _SECONDS_BUCKETS
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram(self._get_buckets(name))
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe the seconds spent in the block under <name>.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def take(self) -> Tuple[Dict[Tuple[str, Labels], float], Dict[Tuple[str, Labels], Histogram]]:
+        """Return the counters and histograms recorded since the last take
+        and start over, e.g. to send the metrics of a worker process to merge.
+        """
+        with self._lock:
+            counters, histograms = self.counters, self.histograms
+            self.counters, self.histograms = {}, {}
+        return counters, histograms
+
+    def merge(self, counters: Dict[Tuple[str, Labels], float], histograms: Dict[Tuple[str, Labels], Histogram]) -> None:
+        """Add the <counters> and <histograms> taken from other metrics.
+        """
+        with self._lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, histogram in histograms.items():
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(histogram.buckets)
+                self.histograms[key].merge(histogram)
+
+    def _format_labels(self, labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+        pairs = labels + extra
+        if pairs == ():
+            return ''
+        escaped = (
+            (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+            for name, value in pairs
+        )
+        return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(self.histograms.items(), key=lambda item: item[0])
+
+            typed = set()
+            for (name, labels), value in counters:
+                metric = f'{self.prefix}_{name}'
+                if metric not in typed:
+                    lines.append(f'# TYPE {metric} counter')
+                    typed.add(metric)
+                lines.append(f'{metric}{self._format_labels(labels)} {value}')
+
+            for (name, labels), histogram in histograms:
+                metric = f'{self.prefix}_{name}'
+                if metric not in typed:
+                    lines.append(f'# TYPE {metric} histogram')
+                    typed.add(metric)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + ['+Inf'], histogram.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{self._format_labels(labels, (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{metric}_sum{self._format_labels(labels)} {histogram.total}')
+                lines.append(f'{metric}_count{self._format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def to_dict(self) -> Dict[str, List[Dict]]:
+        """Return the metrics as JSON-serializable lists of counters and histograms.
+        """
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(labels), 'value': value}
+                    for (name, labels), value in sorted(self.counters.items())
+                ],
+                'histograms': [
+                    {
+                        'name': name,
+                        'labels': dict(labels),
+                        'buckets': histogram.buckets,
+                        'counts': histogram.counts,
+                        'sum': histogram.total,
+                        'count': histogram.count
+                    }
+                    for (name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0])
+                ]
+            }
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the metrics to <path> (e.g. for the node exporter's textfile collector).
+        """
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'w') as file:
+            file.write(self.to_prometheus())
+        os.replace(temporary_path, path)
+
+    def write_json(self, path: str) -> None:
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+
+_metrics = NullMetrics()
+
+
+def get_metrics() -> NullMetrics:
+    """Return the metrics the pipeline records to (NullMetrics unless enabled).
+    """
+    return _metrics
+
+
+def enable_metrics(metrics: Metrics = None) -> Metrics:
+    """Start recording the pipeline's metrics to <metrics> (new Metrics if not given).
+    """
+    global _metrics
+    _metrics = metrics if metrics is not None else Metrics()
+    return _metrics
+
+
+def disable_metrics() -> None:
+    global _metrics
+    _metrics = NullMetrics()
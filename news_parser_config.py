@@ -1,25 +1,33 @@
 from typing import Dict, List
 from scraper.config.metadata import Schema
 from scraper.config.news_site import Site, RareSite
+from scraper.config.instruction_plan import InstructionPlan
 from scraper.instructions.infrequent import Instructions
+from scraper.metrics import get_metrics
 
 
 class NewsParserConfig:
     """
     """
     instructions: Dict[str, Dict]
+    plans: Dict[str, InstructionPlan]
+    adaptive: bool
     
-    def __init__(self) -> None:
-        """
+    def __init__(self, adaptive: bool = False) -> None:
+        """With <adaptive>, the compiled plans try the fallbacks of each
+        column in order of their successes (see ColumnPlan).
         """
+        self.adaptive = adaptive
         self.instructions = self._load_parser_instructions()
+        self.plans = self._compile_parser_instructions()
 
 
     def has_instructions(self, site_name: str) -> bool:
         """Check if there is parsing instruction available
-        for articles from the news site <site_name>.
+        for articles from the news site <site_name>. A site 
+        with an empty instruction has none available.
         """
-        return site_name in self.instructions
+        return site_name in self.instructions and self.instructions[site_name] != {}
     
 
     def get_instructions(self, site_name: Site) -> Dict[str, str]:
@@ -29,6 +37,13 @@ class NewsParserConfig:
         return self.instructions[site_name]
     
 
+    def get_plan(self, site_name: Site) -> InstructionPlan:
+        """Return the compiled parsing instruction for articles
+        from the news site <site_name>.
+        """
+        return self.plans[site_name]
+    
+
     def instructions_in_scope(self, site_name: Site) -> bool:
         """Check if the set of columns that are instructed to
         be parsed from <site_name>'s articles is within scope.
@@ -38,6 +53,15 @@ class NewsParserConfig:
         return set(instructions_columns) <= set(columns_in_scope)
 
 
+    def _compile_parser_instructions(self) -> Dict[str, InstructionPlan]:
+        """Compile the instructions of every news site into XPath
+        objects once, so that parsing an article doesn't need to 
+        classify and translate the queries again.
+        """
+        with get_metrics().time('instruction_compile_seconds'):
+            return {site_name: InstructionPlan(site_name, instructions, self.adaptive) for site_name, instructions in self.instructions.items()}
+
+
     def _load_parser_instructions(self) -> Dict[str, List[Dict]]:
         """Return instructions containing either XPATH or
         CSS selector queries for parsing the HTML text
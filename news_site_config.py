@@ -1,4 +1,4 @@
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from scraper.config.news_site import Site, RareSite
 
 import re
@@ -8,11 +8,16 @@ class SiteConfig:
     """Config information for various news provider sites. 
     """
     site_names: Dict[str, Site]
+    publisher_names: Dict[str, Site]
+    replay_base_urls: List[str]
     
-    def __init__(self) -> None:
-        """
+    def __init__(self, replay_base_urls: List[str] = None) -> None:
+        """URLs served under <replay_base_urls> (e.g. by a ReplayServer)
+        are taken as the original URLs they replay.
         """
+        self.replay_base_urls = list(replay_base_urls) if replay_base_urls is not None else []
         self.site_names = self._load_site_names()
+        self.publisher_names = self._load_publisher_names()
 
 
     def get_site_name(self, site_url: str) -> str:
@@ -27,9 +32,36 @@ class SiteConfig:
         return 'TBD'
     
 
+    def get_site_name_by_publisher(self, publisher: str) -> str:
+        """Return the site name of the publisher <publisher> as
+        shown on Google News search results. (E.g. 'Reuters', 
+        'USDA Foreign Agricultural Service (.gov)', etc)
+        If the publisher isn't found, then it is 'TBD'.
+        """
+        publisher_name = self._normalize_publisher(publisher)
+        if publisher_name in self.publisher_names:
+            return self.publisher_names[publisher_name]
+        return 'TBD'
+    
+
+    def _normalize_publisher(self, publisher: str) -> str:
+        return ' '.join(publisher.lower().replace('(.gov)', '').split())
+
+
+    def _get_original_url(self, site_url: str) -> str:
+        """Return the original URL of <site_url> if it is served by a
+        replay server (e.g. http://127.0.0.1:8000/news.google.com/search).
+        """
+        for base_url in self.replay_base_urls:
+            if site_url.startswith(f'{base_url}/'):
+                return f'https://{site_url[len(base_url) + 1:]}'
+        return site_url
+
+
     def _get_site_domain(self, site_url: str) -> Optional[str]:
         """Return the domain of <site_url>. (E.g. news.google.com, etc)
         """
+        site_url = self._get_original_url(site_url)
         url_pattern = r'http\S*://(\S*?)/\S+'
         base_urls = re.findall(url_pattern, site_url)
         return base_urls[0] if base_urls != [] else None
@@ -84,4 +116,37 @@ class SiteConfig:
             'www.newscientist.com': RareSite.NEW_SCIENTIST,
             'www.researchgate.net': RareSite.RESEARCH_GATE,
             'finance.yahoo.com': RareSite.YAHOO_FINANCE
-        }
\ No newline at end of file
+        }
+
+
+    def _load_publisher_names(self) -> Dict[str, Site]:
+        """Contains the publisher names shown on Google News 
+        search results and their site names. Every site name
+        is its own publisher name, plus the aliases below.
+
+        * Needs to be updated when Google News shows a known
+        site under a different publisher name.
+        """
+        aliases = {
+            'EIA': RareSite.ENERGY_INFORMATION_ADMINISTRATION,
+            'U.S. Energy Information Administration': RareSite.ENERGY_INFORMATION_ADMINISTRATION,
+            'USDA ERS': RareSite.ERS_USDA,
+            'USDA FAS': RareSite.FAS_USDA,
+            'Globe Newswire': RareSite.GLOBE_NEWSWIRE,
+            'Clean Air Task Force': RareSite.CLEAN_AIR_TASK_FORCE,
+            'Transport & Environment': RareSite.TRANSPORT_ENVIRONMENT,
+            'Global Market Insights': RareSite.GLOBAL_MARKET_INSIGHTS,
+            'Waste Management World': RareSite.WASTE_MANAGEMENT_WORLD,
+            'IEA': RareSite.INTERNATIONAL_ENERGY_AGENCY,
+            'International Energy Agency': RareSite.INTERNATIONAL_ENERGY_AGENCY,
+            'ETEnergyWorld': RareSite.ET_ENERGYWORLD,
+            'Clariant': RareSite.CLARIANT,
+            'biofuels-news.com': RareSite.BIOFUELS_INTERNATIONAL,
+            'ResourceWise': RareSite.RESOURCE_WISE,
+            'UCS': RareSite.UNION_OF_CONCERNED_SCIENTISTS,
+            'ING': RareSite.ING_THINK,
+            'TT News': RareSite.TRANSPORT_TOPICS
+        }
+        publisher_names = {self._normalize_publisher(site_name): site_name for site_name in set(self.site_names.values())}
+        publisher_names.update({self._normalize_publisher(alias): site_name for alias, site_name in aliases.items()})
+        return publisher_names
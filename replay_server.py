@@ -0,0 +1,232 @@
+from logging import Logger
+from threading import Lock, Thread
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+from warcio.archiveiterator import ArchiveIterator
+from scraper.config.news_site_config import SiteConfig
+from scraper.utils import setup_logger
+
+import re
+import time
+import random
+
+
+_SCRIPT = re.compile(rb'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+_SKIPPED_HEADERS = {'content-length', 'content-encoding', 'transfer-encoding', 'connection', 'location'}
+
+
+@dataclass
+class ReplayedResponse:
+    """A response recorded in a WARC file.
+    """
+    status: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+
+@dataclass
+class FailureMode:
+    """How an injected failure shows to the client.
+    """
+    STATUS: str = 'status'
+    HANG: str = 'hang'
+    RESET: str = 'reset'
+
+
+def _url_key(url: str) -> str:
+    """Return <url> without its scheme and fragment, which is how
+    recorded responses are looked up.
+    """
+    parts = urlsplit(url)
+    return f'{parts.netloc.lower()}{parts.path or "/"}' + (f'?{parts.query}' if parts.query else '')
+
+
+@dataclass
+class ReplayServer:
+    """A local HTTP server that serves the responses recorded in WARC files,
+    as a stand-in for Google News and the publisher sites.
+
+    Every recorded URL is served under the server's base URL followed by
+    its host, e.g. https://news.google.com/search?q=x is served at
+    <base_url>/news.google.com/search?q=x. Links and redirects between
+    recorded hosts are rewritten the same way, and the SiteConfig of
+    get_site_config maps these URLs back to their original site.
+
+    Each response is delayed by <latency> seconds (plus up to <jitter>),
+    and fails with probability <failure_rate> as set by <failure_mode>:
+    a <failure_status> response, a hang of <hang_seconds>, or a closed
+    connection. Failures are drawn from <seed>, so runs are repeatable.
+    """
+    _logger: Logger
+    _lock: Lock
+    _random: random.Random
+    _link_pattern: re.Pattern
+    _server: Optional[ThreadingHTTPServer] = None
+    _thread: Optional[Thread] = None
+    responses: Dict[str, ReplayedResponse] = field(default_factory=dict)
+    host: str = '127.0.0.1'
+    port: int = 0
+    latency: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    failure_mode: str = FailureMode.STATUS
+    failure_status: int = 503
+    hang_seconds: float = 60.0
+    strip_scripts: bool = True
+    requests: int = 0
+    failures: int = 0
+
+    def __init__(self, warc_paths: List[str], host: str = '127.0.0.1', port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, failure_mode: str = FailureMode.STATUS, failure_status: int = 503,
+                 hang_seconds: float = 60.0, strip_scripts: bool = True, seed: int = 0) -> None:
+        """Load the responses of <warc_paths>. With <strip_scripts>, scripts are
+        removed from HTML pages, since recorded pages are already rendered.
+        """
+        self._logger = setup_logger(self.__class__.__name__)
+        self._lock = Lock()
+        self._random = random.Random(seed)
+        self._server = None
+        self._thread = None
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_mode = failure_mode
+        self.failure_status = failure_status
+        self.hang_seconds = hang_seconds
+        self.strip_scripts = strip_scripts
+        self.requests = 0
+        self.failures = 0
+        self.responses = {}
+        for warc_path in warc_paths:
+            self._load(warc_path)
+        hosts = sorted({key.split('/', 1)[0] for key in self.responses}, key=len, reverse=True)
+        self._link_pattern = re.compile(rb'(?:https?:)?//(' + (b'|'.join(re.escape(host.encode('utf-8')) for host in hosts) or rb'(?!)') + rb')(?=[/"\'?#])')
+        self._logger.info(f'Loaded {len(self.responses)} recorded responses')
+
+    def _load(self, warc_path: str) -> None:
+        with open(warc_path, 'rb') as warc_file:
+            for record in ArchiveIterator(warc_file):
+                if record.rec_type != 'response' or record.http_headers is None:
+                    continue
+                url = record.rec_headers.get_header('WARC-Target-URI')
+                self.responses[_url_key(url)] = ReplayedResponse(
+                    int(record.http_headers.get_statuscode()),
+                    record.http_headers.headers,
+                    record.content_stream().read()
+                )
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def get_url(self, url: str) -> str:
+        """Return the URL <url> is served at by this server.
+        """
+        return f'{self.base_url}/{_url_key(url)}'
+
+    def get_site_config(self) -> SiteConfig:
+        """Return a site config that knows the URLs served by this server
+        (to be given to a scraper once the server is started).
+        """
+        return SiteConfig(replay_base_urls=[self.base_url])
+
+    def get_domain(self, domain: str = 'news.google.com') -> str:
+        """Return what URLs of <domain> served by this server contain, to be
+        used as a scraper's domain.
+        """
+        return f'{self.host}:{self.port}/{domain}'
+
+    def _rewrite_body(self, body: bytes) -> bytes:
+        """Point the links to recorded hosts in <body> to this server.
+        """
+        if self.strip_scripts:
+            body = _SCRIPT.sub(b'', body)
+        base_url = f'{self.base_url}/'.encode('utf-8')
+        return self._link_pattern.sub(lambda match: base_url + match.group(1), body)
+
+    def _should_fail(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            fail = self.failure_rate > 0 and self._random.random() < self.failure_rate
+            self.failures += fail
+            return fail
+
+    def _handle(self, handler: BaseHTTPRequestHandler) -> None:
+        if self.latency > 0 or self.jitter > 0:
+            with self._lock:
+                delay = self.latency + self._random.uniform(0, self.jitter)
+            time.sleep(delay)
+
+        if self._should_fail():
+            if self.failure_mode == FailureMode.HANG:
+                time.sleep(self.hang_seconds)
+                handler.close_connection = True
+                return
+            if self.failure_mode == FailureMode.RESET:
+                handler.close_connection = True
+                return
+            handler.send_error(self.failure_status)
+            return
+
+        response = self.responses.get(_url_key(f'http://{handler.path.lstrip("/")}'))
+        if response is None:
+            handler.send_error(404, 'Not recorded')
+            return
+
+        body = response.body
+        headers = [(name, value) for name, value in response.headers if name.lower() not in _SKIPPED_HEADERS]
+        if any(name.lower() == 'content-type' and 'html' in value for name, value in headers):
+            body = self._rewrite_body(body)
+
+        handler.send_response(response.status)
+        for name, value in headers:
+            handler.send_header(name, value)
+        location = next((value for name, value in response.headers if name.lower() == 'location'), None)
+        if location is not None:
+            handler.send_header('Location', self.get_url(location) if _url_key(location) in self.responses else location)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if handler.command != 'HEAD':
+            handler.wfile.write(body)
+
+    def start(self) -> 'ReplayServer':
+        """Start serving on a background thread.
+        """
+        replay_server = self
+
+        class ReplayHandler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self) -> None:
+                replay_server._handle(self)
+
+            def do_HEAD(self) -> None:
+                replay_server._handle(self)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), ReplayHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = Thread(target=self._server.serve_forever, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+        self._logger.info(f'Replaying recorded responses at {self.base_url}')
+        return self
+
+    def finish(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._logger.info(f'Served {self.requests} requests ({self.failures} injected failures)')
+
+    def __enter__(self) -> 'ReplayServer':
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.finish()
@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+from logging import Logger
+from dataclasses import dataclass
+from typing import Dict, Generator, Iterable, List, Optional
+from scraper.config.metadata import Row
+from scraper.news.date_normalizer import DateNormalizer
+from scraper.utils import setup_logger
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+
+ROW_SCHEMA = pa.schema([
+    ('site', pa.dictionary(pa.int32(), pa.string())),
+    ('url', pa.string()),
+    ('theme', pa.dictionary(pa.int32(), pa.string())),
+    ('keyword', pa.dictionary(pa.int32(), pa.string())),
+    ('title', pa.string()),
+    ('date', pa.string()),
+    ('author', pa.string()),
+    ('content', pa.large_string()),
+    ('fetched_at', pa.timestamp('ns', tz='UTC')),
+    ('published_at', pa.timestamp('ns', tz='UTC')),
+    ('duplicate_of', pa.string())
+])
+
+
+@dataclass
+class RowBatchEncoder:
+    """Converts rows of parsed articles into Arrow record batches of
+    ROW_SCHEMA. Dictionary-encoded columns share one growing dictionary
+    across batches, so later batches only add new values to it.
+    The published_at column is the batch's dates normalized by <date_normalizer>.
+    """
+    _dictionaries: Dict[str, Dict[str, int]]
+    date_normalizer: Optional[DateNormalizer] = None
+
+    def __init__(self, date_normalizer: Optional[DateNormalizer] = None) -> None:
+        self._dictionaries = {field.name: {} for field in ROW_SCHEMA if pa.types.is_dictionary(field.type)}
+        self.date_normalizer = date_normalizer if date_normalizer is not None else DateNormalizer()
+
+    def _encode_dictionary(self, column: str, values: List[Optional[str]]) -> pa.DictionaryArray:
+        dictionary = self._dictionaries[column]
+        indices = [None if value is None else dictionary.setdefault(value, len(dictionary)) for value in values]
+        return pa.DictionaryArray.from_arrays(pa.array(indices, type=pa.int32()), pa.array(list(dictionary), type=pa.string()))
+
+    def encode(self, rows: List[Row]) -> pa.RecordBatch:
+        """Return the record batch of <rows>.
+        """
+        fetched_at = pd.to_datetime(pd.Series([row.fetched_at for row in rows], dtype='float64'), unit='s', utc=True)
+        arrays = []
+        for field in ROW_SCHEMA:
+            if field.name == 'fetched_at':
+                arrays.append(pa.array(fetched_at, type=field.type))
+            elif field.name == 'published_at':
+                dates = self.date_normalizer.normalize(
+                    pd.Series([row.date for row in rows], dtype='object'), pd.Series([row.site for row in rows], dtype='object'), fetched_at
+                )
+                arrays.append(pa.array(dates, type=field.type))
+            elif field.name in self._dictionaries:
+                arrays.append(self._encode_dictionary(field.name, [getattr(row, field.name) for row in rows]))
+            else:
+                arrays.append(pa.array([getattr(row, field.name) for row in rows], type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=ROW_SCHEMA)
+
+    def encode_stream(self, rows: Iterable[Row], batch_size: int = 1000) -> Generator[pa.RecordBatch, None, None]:
+        """Yield a record batch for every <batch_size> rows of <rows>.
+        """
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= batch_size:
+                yield self.encode(buffer)
+                buffer = []
+        if buffer != []:
+            yield self.encode(buffer)
+
+
+@dataclass
+class RowSink(ABC):
+    """An output file that rows of parsed articles are written to
+    incrementally, <batch_size> rows at a time. Subclasses write the
+    batches in their file format.
+    """
+    path: str
+    _logger: Logger
+    _encoder: RowBatchEncoder
+    _buffer: List[Row]
+    batch_size: int = 1000
+    rows_written: int = 0
+
+    def __init__(self, path: str, batch_size: int = 1000) -> None:
+        self.path = path
+        self.batch_size = batch_size
+        self.rows_written = 0
+        self._logger = setup_logger(self.__class__.__name__)
+        self._encoder = RowBatchEncoder()
+        self._buffer = []
+
+    @abstractmethod
+    def _write_batch(self, batch: pa.RecordBatch) -> None:
+        pass
+
+    @abstractmethod
+    def _close_writer(self) -> None:
+        pass
+
+    def set_date_normalizer(self, date_normalizer: DateNormalizer) -> None:
+        """Normalize the dates of the rows written from now on with <date_normalizer>
+        (e.g. the one of the ArticleParser the rows come from).
+        """
+        self._encoder.date_normalizer = date_normalizer
+
+    def flush(self) -> None:
+        """Write the buffered rows as one batch.
+        """
+        if self._buffer != []:
+            self._write_batch(self._encoder.encode(self._buffer))
+            self.rows_written += len(self._buffer)
+            self._buffer = []
+
+    def write(self, rows: Iterable[Row]) -> None:
+        """Write <rows>, which can be a generator (e.g. ArticleParser.stream_articles).
+        """
+        for row in rows:
+            self._buffer.append(row)
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+
+    def close(self) -> None:
+        self.flush()
+        self._close_writer()
+        self._logger.info(f'Wrote {self.rows_written} rows to {self.path}')
+
+    def __enter__(self) -> 'RowSink':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+@dataclass
+class ParquetRowSink(RowSink):
+    """A Parquet file of rows of parsed articles. Each batch is written
+    as its own row group.
+    """
+    _writer: pq.ParquetWriter = None
+    compression: str = 'zstd'
+
+    def __init__(self, path: str, batch_size: int = 1000, compression: str = 'zstd') -> None:
+        super().__init__(path, batch_size)
+        self.compression = compression
+        self._writer = pq.ParquetWriter(path, ROW_SCHEMA, compression=compression)
+
+    def _write_batch(self, batch: pa.RecordBatch) -> None:
+        self._writer.write_batch(batch)
+
+    def _close_writer(self) -> None:
+        self._writer.close()
+
+
+@dataclass
+class ArrowIpcRowSink(RowSink):
+    """An Arrow IPC (Feather v2) file of rows of parsed articles.
+    """
+    _writer: ipc.RecordBatchFileWriter = None
+
+    def __init__(self, path: str, batch_size: int = 1000) -> None:
+        super().__init__(path, batch_size)
+        self._writer = ipc.new_file(path, ROW_SCHEMA, options=ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def _write_batch(self, batch: pa.RecordBatch) -> None:
+        self._writer.write_batch(batch)
+
+    def _close_writer(self) -> None:
+        self._writer.close()
@@ -0,0 +1,98 @@
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+import pandas as pd
+
+
+@dataclass
+class QueryProfile:
+    """The evaluations of one parsing instruction query.
+    """
+    evaluations: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    hits: int = 0
+    nodes: int = 0
+
+    def add(self, other: 'QueryProfile') -> None:
+        self.evaluations += other.evaluations
+        self.seconds += other.seconds
+        self.max_seconds = max(self.max_seconds, other.max_seconds)
+        self.hits += other.hits
+        self.nodes += other.nodes
+
+
+@dataclass
+class SelectorProfiler:
+    """Records the wall time, hits and returned node counts of each
+    (site, column, query) evaluated by the article parser.
+
+    Fallbacks after the first one that parses anything aren't evaluated
+    while parsing, so they would never show up. With <exhaustive>, they
+    are evaluated anyway (for profiling only), so that queries that never
+    match can be found.
+    """
+    exhaustive: bool = False
+    profiles: Dict[Tuple[str, str, str], QueryProfile] = field(default_factory=dict)
+
+    def __init__(self, exhaustive: bool = False) -> None:
+        self.exhaustive = exhaustive
+        self.profiles = {}
+
+    def record(self, site: str, column: str, query: str, seconds: float, nodes: int) -> None:
+        key = (site, column, query)
+        if key not in self.profiles:
+            self.profiles[key] = QueryProfile()
+        profile = self.profiles[key]
+        profile.evaluations += 1
+        profile.seconds += seconds
+        profile.max_seconds = max(profile.max_seconds, seconds)
+        profile.hits += nodes > 0
+        profile.nodes += nodes
+
+    def merge(self, profiles: Dict[Tuple[str, str, str], QueryProfile]) -> None:
+        """Add the <profiles> recorded by another profiler (e.g. in a parsing process).
+        """
+        for key, profile in profiles.items():
+            if key not in self.profiles:
+                self.profiles[key] = QueryProfile()
+            self.profiles[key].add(profile)
+
+    def take(self) -> Dict[Tuple[str, str, str], QueryProfile]:
+        """Return the profiles recorded so far and start over.
+        """
+        profiles, self.profiles = self.profiles, {}
+        return profiles
+
+    def report(self) -> pd.DataFrame:
+        """Return the queries ranked by their total time. Queries that
+        never matched are flagged as dead.
+        """
+        report_df = pd.DataFrame(
+            [
+                {
+                    'site': site,
+                    'column': column,
+                    'query': query,
+                    'evaluations': profile.evaluations,
+                    'hits': profile.hits,
+                    'nodes': profile.nodes,
+                    'total_ms': profile.seconds * 1000,
+                    'max_ms': profile.max_seconds * 1000
+                }
+                for (site, column, query), profile in self.profiles.items()
+            ],
+            columns=['site', 'column', 'query', 'evaluations', 'hits', 'nodes', 'total_ms', 'max_ms']
+        )
+        report_df['misses'] = report_df['evaluations'] - report_df['hits']
+        report_df['hit_rate'] = (report_df['hits'] / report_df['evaluations']).astype('float')
+        report_df['mean_ms'] = (report_df['total_ms'] / report_df['evaluations']).astype('float')
+        report_df['mean_nodes'] = (report_df['nodes'] / report_df['evaluations']).astype('float')
+        report_df['time_share'] = (report_df['total_ms'] / report_df['total_ms'].sum()).astype('float')
+        report_df['dead'] = report_df['hits'] == 0
+        report_df = report_df.sort_values('total_ms', ascending=False, ignore_index=True)
+        report_df.insert(0, 'rank', range(1, len(report_df) + 1))
+        return report_df[[
+            'rank', 'site', 'column', 'query', 'evaluations', 'hits', 'misses', 'hit_rate',
+            'nodes', 'mean_nodes', 'total_ms', 'mean_ms', 'max_ms', 'time_share', 'dead'
+        ]]
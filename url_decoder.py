@@ -0,0 +1,262 @@
+from logging import Logger
+from threading import Lock
+from datetime import datetime, timezone
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlparse
+from scraper.utils import setup_logger
+
+import os
+import re
+import json
+import base64
+import sqlite3
+import httpx
+
+
+_ARTICLE_ID_PATTERN = re.compile(r'/(?:rss/)?(?:read|articles)/([A-Za-z0-9_-]+)')
+_SIGNATURE_PATTERN = re.compile(r'data-n-a-sg="([^"]+)"')
+_TIMESTAMP_PATTERN = re.compile(r'data-n-a-ts="([^"]+)"')
+_OPAQUE_ID_PREFIX = 'AU_yqL'
+
+
+def _read_varint(payload: bytes, position: int) -> Tuple[int, int]:
+    """Read a protobuf varint from <payload> at <position>.
+    Return the value and the position after it.
+    """
+    value, shift = 0, 0
+    while True:
+        byte = payload[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _iter_length_delimited_fields(payload: bytes) -> Iterator[bytes]:
+    """Yield the length-delimited (string/bytes) fields of the protobuf
+    message <payload>, skipping over every other wire type.
+    """
+    position = 0
+    while position < len(payload):
+        tag, position = _read_varint(payload, position)
+        wire_type = tag & 0x07
+        if wire_type == 0:
+            _, position = _read_varint(payload, position)
+        elif wire_type == 1:
+            position += 8
+        elif wire_type == 2:
+            length, position = _read_varint(payload, position)
+            yield payload[position:position + length]
+            position += length
+        elif wire_type == 5:
+            position += 4
+        else:
+            return
+
+
+@dataclass
+class GoogleNewsUrlDecoder:
+    """Decodes Google News article links (news.google.com/read/CBMi...) into
+    their publisher URLs without loading them in a browser. Older links carry
+    the URL in their base64 protobuf payload and are decoded locally. Newer
+    links only carry an opaque ID and are resolved in batches through Google
+    News' batchexecute endpoint. Every decoded URL is memoized in a SQLite table.
+    """
+    _logger: Logger
+    _lock: Lock
+    _connection: sqlite3.Connection
+    _client: Optional[httpx.Client] = None
+    db_path: str = os.path.join('data', 'cache', 'google_news_urls.sqlite')
+    batch_size: int = 20
+    domain: str = 'news.google.com'
+    batch_url: str = 'https://news.google.com/_/DotsSplashUi/data/batchexecute'
+
+    def __init__(self, db_path: str = None, batch_size: int = 20) -> None:
+        """Open the URL mapping table at <db_path>.
+        """
+        self._logger = setup_logger(self.__class__.__name__)
+        self._lock = Lock()
+        self._client = None
+        self.batch_size = batch_size
+        if db_path is not None:
+            self.db_path = db_path
+        if os.path.dirname(self.db_path) != '':
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS url_map ('
+            'article_id TEXT PRIMARY KEY, '
+            'publisher_url TEXT NOT NULL, '
+            'decoded_at TEXT NOT NULL)'
+        )
+        self._connection.commit()
+
+    def _get_client(self) -> httpx.Client:
+        if self._client is None:
+            self._client = httpx.Client(
+                follow_redirects=True,
+                timeout=30.0,
+                headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36'}
+            )
+        return self._client
+
+    def is_google_news_url(self, article_url: str) -> bool:
+        """Check if <article_url> is a Google News article link.
+        """
+        return urlparse(article_url).netloc == self.domain and self.get_article_id(article_url) is not None
+
+    def get_article_id(self, article_url: str) -> Optional[str]:
+        """Return the encoded article ID (i.e. CBMi...) of the
+        Google News link <article_url>.
+        """
+        article_ids = _ARTICLE_ID_PATTERN.findall(urlparse(article_url).path)
+        return article_ids[0] if article_ids != [] else None
+
+    def _decode_locally(self, article_id: str) -> Optional[str]:
+        """Return the publisher URL stored in the protobuf payload of
+        <article_id>, or None if it only carries an opaque ID.
+        """
+        try:
+            payload = base64.urlsafe_b64decode(article_id + '=' * (-len(article_id) % 4))
+            for field in _iter_length_delimited_fields(payload):
+                value = field.decode('utf-8', errors='ignore')
+                if value.startswith('http'):
+                    return value
+                if value.startswith(_OPAQUE_ID_PREFIX):
+                    return None
+        except (ValueError, IndexError):
+            self._logger.error(f'Unable to decode the Google News article ID "{article_id}"')
+        return None
+
+    def _get_decoding_params(self, article_id: str) -> Optional[Tuple[str, str]]:
+        """Return the signature and timestamp that Google News requires
+        for resolving the opaque <article_id>.
+        """
+        try:
+            response = self._get_client().get(f'https://{self.domain}/rss/articles/{article_id}')
+        except httpx.HTTPError as error:
+            self._logger.error(f'Unable to get the decoding parameters of "{article_id}" -> {error.__class__.__name__}')
+            return None
+        signatures = _SIGNATURE_PATTERN.findall(response.text)
+        timestamps = _TIMESTAMP_PATTERN.findall(response.text)
+        if signatures == [] or timestamps == []:
+            return None
+        return signatures[0], timestamps[0]
+
+    def _decode_batch(self, article_ids: List[str]) -> Dict[str, str]:
+        """Resolve the opaque <article_ids> with a single batchexecute request.
+        """
+        requests, requested_ids = [], []
+        for article_id in article_ids:
+            params = self._get_decoding_params(article_id)
+            if params is None:
+                continue
+            signature, timestamp = params
+            article_request = [
+                'garturlreq',
+                [['X', 'X', ['X', 'X'], None, None, 1, 1, 'US:en', None, 1, None, None, None, None, None, 0, 1],
+                 'X', 'X', 1, [1, 1, 1], 1, 1, None, 0, 0, None, 0],
+                article_id,
+                int(timestamp),
+                signature
+            ]
+            requests.append(['Fbv4je', json.dumps(article_request), None, str(len(requested_ids) + 1)])
+            requested_ids.append(article_id)
+
+        if requests == []:
+            return {}
+
+        self._logger.info(f'Resolving {len(requests)} Google News article IDs in one batch')
+        try:
+            response = self._get_client().post(
+                self.batch_url,
+                content=f'f.req={quote(json.dumps([requests]))}',
+                headers={'Content-Type': 'application/x-www-form-urlencoded;charset=UTF-8'}
+            )
+            entries = json.loads(response.text.split('\n\n')[1])
+        except (httpx.HTTPError, IndexError, ValueError) as error:
+            self._logger.error(f'Unable to resolve the Google News article IDs in batch -> {error.__class__.__name__}')
+            return {}
+
+        publisher_urls = {}
+        for entry in entries:
+            if not isinstance(entry, list) or len(entry) < 3 or entry[0] != 'wrb.fr' or entry[2] is None:
+                continue
+            try:
+                request_index = int(entry[-1]) - 1
+                publisher_urls[requested_ids[request_index]] = json.loads(entry[2])[1]
+            except (IndexError, TypeError, ValueError):
+                continue
+        return publisher_urls
+
+    def _lookup(self, article_ids: List[str]) -> Dict[str, str]:
+        """Return the memoized publisher URLs of <article_ids>.
+        """
+        publisher_urls = {}
+        with self._lock:
+            for start in range(0, len(article_ids), 500):
+                chunk = article_ids[start:start + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                rows = self._connection.execute(
+                    f'SELECT article_id, publisher_url FROM url_map WHERE article_id IN ({placeholders})', chunk
+                ).fetchall()
+                publisher_urls.update(dict(rows))
+        return publisher_urls
+
+    def _remember(self, publisher_urls: Dict[str, str]) -> None:
+        """Memoize the decoded <publisher_urls> of each article ID.
+        """
+        decoded_at = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO url_map (article_id, publisher_url, decoded_at) VALUES (?, ?, ?)',
+                [(article_id, publisher_url, decoded_at) for article_id, publisher_url in publisher_urls.items()]
+            )
+            self._connection.commit()
+
+    def decode_all(self, article_urls: List[str]) -> Dict[str, str]:
+        """Return a mapping of each of <article_urls> to its publisher URL.
+        URLs that aren't Google News links map to themselves, and links that
+        can't be decoded are left out (they need the browser redirect).
+        """
+        decoded_urls = {article_url: article_url for article_url in article_urls if not self.is_google_news_url(article_url)}
+        article_ids = {article_url: self.get_article_id(article_url) for article_url in article_urls if article_url not in decoded_urls}
+
+        publisher_urls = self._lookup(list(set(article_ids.values())))
+        new_publisher_urls = {}
+        opaque_ids = []
+        for article_id in set(article_ids.values()) - set(publisher_urls):
+            publisher_url = self._decode_locally(article_id)
+            if publisher_url is not None:
+                new_publisher_urls[article_id] = publisher_url
+            else:
+                opaque_ids.append(article_id)
+
+        for start in range(0, len(opaque_ids), self.batch_size):
+            new_publisher_urls.update(self._decode_batch(opaque_ids[start:start + self.batch_size]))
+
+        if new_publisher_urls != {}:
+            self._remember(new_publisher_urls)
+        publisher_urls.update(new_publisher_urls)
+
+        for article_url, article_id in article_ids.items():
+            if article_id in publisher_urls:
+                decoded_urls[article_url] = publisher_urls[article_id]
+            else:
+                self._logger.error(f'Unable to decode the Google News article URL -> {article_url}')
+        return decoded_urls
+
+    def decode(self, article_url: str) -> Optional[str]:
+        """Return the publisher URL of the Google News link <article_url>,
+        or None if it can't be decoded.
+        """
+        return self.decode_all([article_url]).get(article_url)
+
+    def finish(self) -> None:
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+        self._connection.close()
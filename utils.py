@@ -3,6 +3,8 @@ from logging import Logger, getLogger, StreamHandler, DEBUG, Formatter
 
 def setup_logger(name: str) -> Logger:
     logger = getLogger(name)
+    if logger.handlers:  # Already set up by another instance
+        return logger
     logger.setLevel(DEBUG)
     console_handler = StreamHandler()
     console_handler.setLevel(DEBUG)
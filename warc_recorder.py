@@ -0,0 +1,72 @@
+from logging import Logger
+from threading import Lock
+from dataclasses import dataclass
+from typing import BinaryIO, List, Tuple
+from http import HTTPStatus
+from io import BytesIO
+from warcio.warcwriter import WARCWriter
+from warcio.statusandheaders import StatusAndHeaders
+from scraper.utils import setup_logger
+
+import os
+
+
+@dataclass
+class WarcRecorder:
+    """Records the pages a scraper visits into a (gzipped) WARC file,
+    which a ReplayServer can serve back offline.
+
+    The browser only exposes the rendered page, so pages are recorded
+    as the HTML the scraper saw, and the Google News redirects as HTTP
+    redirects to the publisher URL the browser ended up at.
+    """
+    path: str
+    _logger: Logger
+    _lock: Lock
+    _file: BinaryIO
+    _writer: WARCWriter
+    records: int = 0
+
+    def __init__(self, path: str) -> None:
+        self._logger = setup_logger(self.__class__.__name__)
+        self._lock = Lock()
+        self.path = path
+        self.records = 0
+        if os.path.dirname(path) != '':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._file = open(path, 'ab')
+        self._writer = WARCWriter(self._file, gzip=True)
+
+    def record_response(self, url: str, body: bytes, status: int = 200, headers: List[Tuple[str, str]] = None) -> None:
+        """Record the response <body> with <status> and <headers> to the request of <url>.
+        """
+        headers = list(headers) if headers is not None else [('Content-Type', 'text/html; charset=utf-8')]
+        headers.append(('Content-Length', str(len(body))))
+        http_headers = StatusAndHeaders(f'{status} {HTTPStatus(status).phrase}', headers, protocol='HTTP/1.1')
+        record = self._writer.create_warc_record(url, 'response', payload=BytesIO(body), http_headers=http_headers)
+        with self._lock:
+            self._writer.write_record(record)
+            self.records += 1
+
+    def record_page(self, url: str, html_content: str) -> None:
+        """Record the page source <html_content> of <url>.
+        """
+        self.record_response(url, html_content.encode('utf-8'))
+
+    def record_redirect(self, url: str, location: str, status: int = 302) -> None:
+        """Record a redirect hop from <url> to <location>.
+        """
+        self.record_response(url, b'', status, [('Location', location)])
+
+    def record_article(self, article_url: str, url: str, html_content: str) -> None:
+        """Record the page source <html_content> of the article at <url>,
+        and the redirect to it if it was reached from <article_url>.
+        """
+        if url != article_url:
+            self.record_redirect(article_url, url)
+        self.record_page(url, html_content)
+
+    def finish(self) -> None:
+        with self._lock:
+            self._file.close()
+        self._logger.info(f'Recorded {self.records} responses to {self.path}')